@@ -3,9 +3,8 @@ import os
 from google import genai
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta, date
-import io
-import pdfplumber
 from app.accounts.matcher import AccountMatcher
+from app.ingest.pdf import first_pages_texts
 
 
 def detect_statement_account(conn, file_name: str, content: bytes, user_id: int) -> Optional[dict]:
@@ -19,9 +18,9 @@ def detect_statement_account(conn, file_name: str, content: bytes, user_id: int)
     text = ""
     if ext == "pdf":
         try:
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                for page in pdf.pages[:2]:  # Read first 2 pages
-                    text += (page.extract_text() or "") + "\n"
+            # Read first 2 pages
+            for page_text in first_pages_texts(content):
+                text += page_text + "\n"
         except Exception:
             pass
     else:
@@ -224,6 +224,13 @@ def get_conn():
         db_path.parent.mkdir(parents=True, exist_ok=True)
         conn = sqlite3.connect(db_path)
         conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside an import's write transaction, and with
+        # synchronous=NORMAL a commit no longer waits for an fsync (the database
+        # stays consistent after a crash; only the last commits can be lost on
+        # power failure). WAL is stored in the file, so this is a no-op once set.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
         return conn
 
 
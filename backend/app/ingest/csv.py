@@ -1,194 +1,254 @@
+import codecs
 import csv
 import io
+import logging
 import re
-from typing import Optional, Tuple, Dict, List
+from itertools import chain, islice
+from typing import Callable, Iterator, Optional, Tuple, Dict, List
 
-from app.ingest.normalize import compute_hash, normalize_amount, normalize_description, parse_amount, parse_date
+from app.ingest.normalize import normalize_amount, normalize_description, parse_amount, parse_date, transaction_hasher
 from app.ingest.profiles import resolve_profile, detect_profile
+from app.ingest.store import insert_transactions
 
+logger = logging.getLogger(__name__)
 
-def _is_duplicate_error(e: Exception) -> bool:
-    """Check if exception is a duplicate/unique constraint violation."""
-    error_msg = str(e)
-    # SQLite uses "UNIQUE constraint failed"
-    # PostgreSQL uses "duplicate key value violates unique constraint"
-    return "UNIQUE" in error_msg.upper() or "duplicate" in error_msg.lower()
+# Lines containing any of these are treated as headers by the raw fallback;
+# ASCII case folding matches what line.lower() did without copying each line
+_HEADER_KEYWORDS = ('date', 'description', 'narration', 'particulars', 'amount', 'total')
+_HEADERISH_RE = re.compile('|'.join(_HEADER_KEYWORDS), re.IGNORECASE | re.ASCII)
+
+# Header row detection: a 'date' column plus any of these
+_STRICT_HEADER_KEYWORDS = ('amount', 'debit', 'credit', 'bal', 'value',
+                           'desc', 'narration', 'particulars', 'remarks')
+_LOOSE_HEADER_KEYWORDS = ('amount', 'debit', 'credit', 'bal', 'value',
+                          'narration', 'desc', 'particulars')
+
+# Cell values that are known to parse to 0.0 without calling parse_amount
+_ZERO_AMOUNTS = frozenset(('0', '0.0', '0.00', '-'))
+
+# Cell classifier used by the raw (headerless) fallback: one match per cell
+# tells an amount (with optional Dr/Cr) from a numeric or "05 Mar 2024" date
+_RAW_CELL_RE = re.compile(
+    r'(?P<amount>-?(?P<number>[0-9,]+\.\d{2})\s*(?P<drcr>Dr|Cr|DR|CR)?)'
+    r'|(?P<date>\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}|\d{1,2}\s+[A-Za-z]{3}\s+\d{2,4})',
+    re.IGNORECASE,
+)
+
+# Upper bound on how much of the file is inspected for delimiter sniffing
+_SNIFF_SAMPLE_BYTES = 16384
+
+# Chunk size for UTF-8 validation of the raw payload
+_DECODE_CHUNK_BYTES = 1 << 16
 
 
 def _detect_delimiter(content: str) -> str:
     """Detect delimiter using csv.Sniffer or fallback."""
+    # Take a sample of lines (callers pass a bounded prefix of the file)
+    lines = content.splitlines()[:20]
+    sample = '\n'.join(lines)
     try:
-        # Take a sample of lines
-        sample = '\n'.join(content.splitlines()[:20])
         dialect = csv.Sniffer().sniff(sample, delimiters=',\t|;')
         return dialect.delimiter
     except csv.Error:
-        # Fallback manual counting
-        lines = content.splitlines()[:20]
-        delimiters = {',': 0, '\t': 0, '|': 0, ';': 0}
-        for line in lines:
-            for d in delimiters:
-                delimiters[d] += line.count(d)
+        # Fallback manual counting over the same sample
+        delimiters = {d: sample.count(d) for d in (',', '\t', '|', ';')}
         best = max(delimiters, key=delimiters.get)
         return best if delimiters[best] >= 5 else ','
 
 
-def _find_header_index(lines: List[str], delimiter: str) -> int:
-    """Find the index of the header row based on common keywords."""
-    # Check first 50 lines for header (increased from 30 for statements with longer preambles)
-    for i, line in enumerate(lines[:50]):  # Changed from 30 to 50
-        # Split by delimiter
-        if delimiter not in line:
-            continue
+def _detect_encoding(payload: bytes) -> str:
+    """Return 'utf-8' if the whole payload is valid UTF-8, else 'latin-1'.
 
-        parts = [p.strip().lower() for p in line.split(delimiter)]
+    Validates in fixed-size chunks through a memoryview so no full-file str
+    is built; latin-1 decodes any byte sequence.
+    """
+    if payload.isascii():
+        return "utf-8"
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(payload)
+    try:
+        for start in range(0, len(view), _DECODE_CHUNK_BYTES):
+            decoder.decode(view[start:start + _DECODE_CHUNK_BYTES])
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin-1"
+    return "utf-8"
 
-        # Check for critical column names
-        # Must have Date AND (Amount OR Debit OR Credit OR Description)
-        has_date = any('date' in p for p in parts)
-        has_money = any(x in p for p in parts for x in ['amount', 'debit', 'credit', 'bal', 'value'])
-        has_desc = any(x in p for p in parts for x in ['desc', 'narration', 'particulars', 'remarks'])
 
-        if has_date and (has_money or has_desc):
-            print(f"Found header at line {i}: {line[:100]}...")
-            return i
+def _iter_lines(payload: bytes, encoding: str) -> Iterator[str]:
+    """Yield stripped, non-empty lines, decoding one line at a time.
 
-    # Fallback: if no header found with strict matching, try looser patterns
-    print("No strict header found, trying looser patterns...")
-    for i, line in enumerate(lines[:100]):  # Check first 100 lines with loose pattern
-        if delimiter not in line:
-            continue
+    Splitting on \n and then \r gives the same lines as \r\n / \r / \n
+    normalization without copying the whole payload.
+    """
+    for chunk in io.BytesIO(payload):
+        for raw in chunk.split(b"\r"):
+            line = raw.decode(encoding).strip()
+            if line:
+                yield line
 
-        parts = [p.strip().lower() for p in line.split(delimiter)]
 
-        # Loose pattern: look for individual keywords
-        # HDFC statements often have specific column names
-        loose_patterns = [
-            # Date must be present, and at least one other keyword
-            (['date'], ['amount', 'debit', 'credit', 'bal', 'value', 'narration', 'desc', 'particulars']),
-        ]
+def _find_header_index(lines: List[str], delimiter: str) -> int:
+    """Find the index of the header row based on common keywords."""
+    # One pass over the first 100 lines: the first 50 (statements with long
+    # preambles) accept the strict keyword set, later lines the loose one.
+    # The loose set is a subset of the strict one, so this returns the same
+    # line as a strict pass over 50 lines followed by a loose pass over 100.
+    # Keywords contain no delimiters or spaces, so substring checks on the
+    # lowered line match the per-column checks.
+    for i, line in enumerate(lines[:100]):
+        if delimiter not in line:
+            continue
 
-        for date_keywords, other_keywords in loose_patterns:
-            has_date = any(any(d in p for d in date_keywords) for p in parts)
-            has_other = any(any(o in p for o in other_keywords) for p in parts)
+        line_lower = line.lower()
+        # Must have Date AND (Amount OR Debit OR Credit OR Description)
+        if 'date' not in line_lower:
+            continue
 
-            if has_date and has_other:
-                print(f"Found header (loose match) at line {i}: {line[:100]}...")
+        if i < 50:
+            if any(kw in line_lower for kw in _STRICT_HEADER_KEYWORDS):
+                logger.debug(f"Found header at line {i}: {line[:100]}...")
                 return i
+        elif any(kw in line_lower for kw in _LOOSE_HEADER_KEYWORDS):
+            logger.debug(f"Found header (loose match) at line {i}: {line[:100]}...")
+            return i
 
-    print("No header found in first 100 lines")
+    logger.debug("No header found in first 100 lines")
     return 0
 
 
+# Standard field -> one precompiled alternation of its header keywords. Each
+# field claims the first header (left to right) that contains any keyword.
+# Plain substring semantics (no word boundaries): 'dr' must match 'Amount Dr'
+# and 'withdraw' must match 'Withdrawal Amt.'.
+_HEADER_ROLE_PATTERNS = tuple(
+    (role, re.compile('|'.join(map(re.escape, keywords))))
+    for role, keywords in (
+        ('date', ('date', 'posted at', 'posted_at')),
+        ('description', ('narration', 'description', 'particulars', 'remarks',
+                         'details', 'merchant', 'vendor')),
+        ('debit', ('debit', 'dr', 'withdraw')),
+        ('credit', ('credit', 'cr', 'dep')),
+        ('amount', ('amount', 'amt', 'value')),
+    )
+)
+
+
 def _auto_map_columns(fieldnames: List[str]) -> Dict[str, str]:
     """Automatically map CSV headers to standard fields using profile detection."""
     # Use the enhanced detect_profile from profiles module
     mapping = detect_profile(fieldnames)
 
-    # If we still don't have a date column, try additional patterns
-    if 'date' not in mapping:
-        normalized = {f: f.lower().strip() for f in fieldnames}
-
-        # Try date-related patterns
-        date_patterns = [
-            'date', 'txn date', 'transaction date', 'trans date',
-            'posting date', 'value date', 'posted at', 'posted_at'
-        ]
-        for f, f_norm in normalized.items():
-            for pattern in date_patterns:
-                if pattern in f_norm:
-                    mapping['date'] = f
-                    break
-            if 'date' in mapping:
-                break
-
-    # If still no description, try more patterns
-    if 'description' not in mapping:
-        normalized = {f: f.lower().strip() for f in fieldnames}
-        desc_patterns = [
-            'narration', 'description', 'particulars', 'remarks',
-            'details', 'transaction details', 'transaction remarks',
-            'merchant', 'vendor', 'description'
-        ]
-        for f, f_norm in normalized.items():
-            for pattern in desc_patterns:
-                if pattern in f_norm:
-                    mapping['description'] = f
-                    break
-            if 'description' in mapping:
-                break
+    # Single pass over the headers: record the first header matching each field
+    candidates: Dict[str, str] = {}
+    for f in fieldnames:
+        f_norm = f.lower().strip()
+        for role, pattern in _HEADER_ROLE_PATTERNS:
+            if role not in candidates and pattern.search(f_norm):
+                candidates[role] = f
+
+    for role in ('date', 'description'):
+        if role not in mapping and role in candidates:
+            mapping[role] = candidates[role]
 
-    # Enhanced debit/credit detection
+    # Split debit/credit only when the profile found neither side
     if 'debit' not in mapping and 'credit' not in mapping:
-        normalized = {f: f.lower().strip() for f in fieldnames}
-
-        # Look for debit patterns
-        debit_patterns = ['debit', 'dr', 'withdrawal', 'withdraw', 'amount dr']
-        for f, f_norm in normalized.items():
-            for pattern in debit_patterns:
-                if pattern in f_norm:
-                    mapping['debit'] = f
-                    break
-            if 'debit' in mapping:
-                break
-
-        # Look for credit patterns
-        credit_patterns = ['credit', 'cr', 'deposit', 'dep', 'amount cr']
-        for f, f_norm in normalized.items():
-            for pattern in credit_patterns:
-                if pattern in f_norm:
-                    mapping['credit'] = f
-                    break
-            if 'credit' in mapping:
-                break
+        for role in ('debit', 'credit'):
+            if role in candidates:
+                mapping[role] = candidates[role]
 
     # Single amount column (only if we don't have split debit/credit)
     if 'debit' not in mapping and 'credit' not in mapping:
-        normalized = {f: f.lower().strip() for f in fieldnames}
-        amount_patterns = ['amount', 'amt', 'value', 'total amount']
-        for f, f_norm in normalized.items():
-            for pattern in amount_patterns:
-                if pattern in f_norm:
-                    mapping['amount'] = f
-                    break
-            if 'amount' in mapping:
-                break
+        if 'amount' not in mapping and 'amount' in candidates:
+            mapping['amount'] = candidates['amount']
 
     return mapping
 
 
-def _get_amount(row: dict, mapping: dict) -> float:
-    """Extract amount using mapping."""
-    # Split Debit/Credit
-    debit_col = mapping.get('debit')
-    credit_col = mapping.get('credit')
+def _cell(row: List[str], pos: Optional[int]) -> Optional[str]:
+    """Return the cell at a column position, or None if the column or cell is missing."""
+    if pos is None or pos >= len(row):
+        return None
+    return row[pos]
 
-    if debit_col and credit_col:
-        debit_val = parse_amount(row.get(debit_col))
-        credit_val = parse_amount(row.get(credit_col))
 
-        # If both are non-zero? Usually one is 0.
-        if debit_val > 0:
-            return -debit_val
-        if credit_val > 0:
-            return credit_val
-        return 0.0
+def _make_amount_getter(positions: Dict[str, int]) -> Callable[[List[str]], float]:
+    """Build the amount extractor for a column layout once, instead of branching per row."""
+    debit_pos = positions.get('debit')
+    credit_pos = positions.get('credit')
 
-    if debit_col:  # Only debit column found? unlikely.
-        # Logic implies split columns usually come together.
-        pass
+    # Split Debit/Credit
+    if debit_pos is not None and credit_pos is not None:
+        def split_amount(row: List[str]) -> float:
+            # Usually one side is blank or zero; skip parsing it entirely
+            debit_raw = (_cell(row, debit_pos) or '').strip()
+            if debit_raw and debit_raw not in _ZERO_AMOUNTS:
+                debit_val = parse_amount(debit_raw)
+                if debit_val > 0:
+                    return -debit_val
+            credit_raw = (_cell(row, credit_pos) or '').strip()
+            if credit_raw and credit_raw not in _ZERO_AMOUNTS:
+                credit_val = parse_amount(credit_raw)
+                if credit_val > 0:
+                    return credit_val
+            return 0.0
+        return split_amount
 
     # Single Amount Column
-    amount_col = mapping.get('amount')
-    if amount_col:
-        val = parse_amount(row.get(amount_col))
-        # Logic to determine sign?
-        # Usually single amount column implies sign is in value (-100 vs 100) OR separate "Type" column (Cr/Dr).
-        # Auto-mapper handles split columns best.
-        # If headers contain "Debit Amount" and "Credit Amount" (like user sample), we use split logic.
-        return val
+    # Usually single amount column implies sign is in value (-100 vs 100) OR separate "Type" column (Cr/Dr).
+    amount_pos = positions.get('amount')
+    if amount_pos is not None:
+        return lambda row: parse_amount(_cell(row, amount_pos))
+
+    return lambda row: 0.0
+
+
+def _make_row_builder(
+    positions: Dict[str, int], account_id: int, statement_id: int, user_id: int
+) -> Callable[[List[str]], Optional[tuple]]:
+    """
+    Build the per-row parser for a column layout: a CSV row in, a transactions
+    insert tuple out, or None when the row has no date or a zero amount.
+    Everything the loop touches is bound to closure locals up front.
+    """
+    date_pos = positions.get('date')
+    desc_pos = positions.get('description')
+    get_amount = _make_amount_getter(positions)
+    hash_row = transaction_hasher(user_id)
+    _parse_date = parse_date
+    _normalize = normalize_description
+
+    def build_row(row: List[str]) -> Optional[tuple]:
+        # Extract Date
+        posted_at = _parse_date(row[date_pos] if date_pos is not None and date_pos < len(row) else None)
+        if not posted_at:
+            return None
+
+        # Extract Description (mapped but absent from the header -> default)
+        if desc_pos is None:
+            description_raw = "Transaction"
+        else:
+            description_raw = row[desc_pos] if desc_pos < len(row) else None
+        description_norm = _normalize(description_raw)
+
+        # Extract Amount
+        amount = get_amount(row)
+        if amount == 0:
+            return None
 
-    return 0.0
+        return (
+            account_id,
+            statement_id,
+            posted_at,
+            amount,
+            "INR",
+            description_raw,
+            description_norm,
+            hash_row(posted_at, amount, description_norm),
+            user_id,
+        )
+
+    return build_row
 
 
 def _parse_unstructured_csv_row(row_values: List[str]) -> Optional[Tuple[str, str, float, bool]]:
@@ -204,14 +264,14 @@ def _parse_unstructured_csv_row(row_values: List[str]) -> Optional[Tuple[str, st
     if not values:
         return None
 
-    # Look for amount pattern in values
-    amount_pattern = re.compile(r'^-?([0-9,]+\.\d{2})\s*(Dr|Cr|DR|CR)?$', re.IGNORECASE)
+    # Classify every cell once; amount candidates are then tried in order
+    matches = [_RAW_CELL_RE.fullmatch(v) for v in values]
+    is_date = [m is not None and m.lastgroup == 'date' for m in matches]
 
-    for i, val in enumerate(values):
-        match = amount_pattern.match(val)
-        if match:
-            amount = parse_amount(match.group(1))
-            drcr = match.group(2)
+    for i, match in enumerate(matches):
+        if match is not None and match.lastgroup == 'amount':
+            amount = parse_amount(match.group('number'))
+            drcr = match.group('drcr')
             is_credit = drcr and drcr.lower() == 'cr'
 
             if amount == 0:
@@ -224,10 +284,7 @@ def _parse_unstructured_csv_row(row_values: List[str]) -> Optional[Tuple[str, st
             for j, v in enumerate(values):
                 if j == i:
                     continue  # Skip the amount field
-                # Try to detect if this is a date
-                if re.match(r'^\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}$', v):
-                    date_parts.append(v)
-                elif re.match(r'^\d{1,2}\s+[A-Za-z]{3}\s+\d{2,4}$', v):
+                if is_date[j]:
                     date_parts.append(v)
                 else:
                     description_parts.append(v)
@@ -259,6 +316,73 @@ def _parse_unstructured_csv_row(row_values: List[str]) -> Optional[Tuple[str, st
     return None
 
 
+def _fallback_unstructured_parse(
+    conn,
+    payload: bytes,
+    encoding: str,
+    header_idx: int,
+    delimiter: str,
+    account_id: int,
+    statement_id: int,
+    user_id: int,
+) -> Tuple[int, int]:
+    """
+    Parse raw data lines when the mapped CSV pass inserted nothing.
+    Returns (inserted, skipped).
+    """
+    skipped = 0
+    rows: List[tuple] = []
+    hash_row = transaction_hasher(user_id)
+
+    logger.info("Standard CSV parsing yielded 0 results - attempting raw data parsing...")
+    logger.debug(f"Lines to parse (starting from index {header_idx + 1})")
+    for i, line in enumerate(islice(_iter_lines(payload, encoding), header_idx, None)):
+        # Skip header-like lines
+        if header_idx > 0 and i <= header_idx:
+            continue
+
+        # Skip empty lines and lines that look like headers
+        if _HEADERISH_RE.search(line):
+            continue
+
+        # Split by delimiter and try to parse
+        row_values = [v for v in map(str.strip, line.split(delimiter)) if v]
+
+        if len(row_values) >= 2:
+            parsed = _parse_unstructured_csv_row(row_values)
+            if parsed:
+                logger.debug("Parsed transaction: %s", parsed)
+                date_str, description, amount, is_credit = parsed
+
+                if amount == 0:
+                    continue
+
+                description_norm = normalize_description(description)
+                tx_hash = hash_row(date_str, amount, description_norm)
+                rows.append((
+                    account_id,
+                    statement_id,
+                    date_str,
+                    amount,
+                    "INR",
+                    description,
+                    description_norm,
+                    tx_hash,
+                    user_id,
+                ))
+
+    # Existing rows count as skipped here, as they always have for the raw fallback
+    inserted, duplicates, failed = insert_transactions(conn, rows)
+    skipped += duplicates + failed
+
+    if inserted > 0:
+        logger.info(f"Raw data parsing found {inserted} transactions")
+    else:
+        logger.info("Raw data parsing found no transactions")
+
+    return inserted, skipped
+
+
 def _validate_mapping(mapping: Dict[str, str], fieldnames: List[str]) -> bool:
     """
     Check if the mapping has column names that exist in the actual fieldnames.
@@ -299,38 +423,33 @@ def ingest_csv(
     profile: Optional[str],
     user_id: int,
 ) -> Tuple[int, int]:
-    # Decode
-    try:
-        decoded = payload.decode("utf-8")
-    except UnicodeDecodeError:
-        decoded = payload.decode("latin-1", errors="ignore")
+    # Pick the encoding for the whole file (utf-8, else latin-1) but decode lazily
+    encoding = _detect_encoding(payload)
+    # A cut multi-byte character at the end of the sample is simply dropped
+    sample = payload[:_SNIFF_SAMPLE_BYTES].decode(encoding, errors="ignore")
+    delimiter = _detect_delimiter(sample)
+    logger.debug(f"Detected delimiter: '{delimiter}'")
 
-    # Normalize line endings (handle \r\n, \r, \n)
-    decoded = decoded.replace("\r\n", "\n").replace("\r", "\n")
-
-    delimiter = _detect_delimiter(decoded)
-    print(f"Detected delimiter: '{delimiter}'")
-
-    # Pre-process lines (skip empty)
-    lines = [line.strip() for line in decoded.splitlines() if line.strip()]
-    print(f"Total lines after stripping: {len(lines)}")
+    # Stream lines (skip empty); only the head is buffered for header detection
+    line_iter = _iter_lines(payload, encoding)
+    head = list(islice(line_iter, 100))
 
     # Locate header row using keywords (robust against preamble)
-    header_idx = _find_header_index(lines, delimiter)
+    header_idx = _find_header_index(head, delimiter)
     if header_idx > 0:
-        lines = lines[header_idx:]
-        print(f"Skipping {header_idx} preamble lines")
+        logger.debug(f"Skipping {header_idx} preamble lines")
 
-    if not lines:
+    if not head:
         return 0, 0, 0
-            
+
     # Parse
     # skipinitialspace=True is crucial for "Date ,Narration" type headers
-    reader = csv.DictReader(lines, delimiter=delimiter, skipinitialspace=True)
-    raw_fieldnames = reader.fieldnames or []
+    lines = chain(head[header_idx:], line_iter)
+    reader = csv.reader(lines, delimiter=delimiter, skipinitialspace=True)
+    raw_fieldnames = next(reader, [])
     # FIX: Clean fieldnames to match row key cleaning
     fieldnames = [f.strip() for f in raw_fieldnames if f]
-    print(f"Parsed fieldnames: {fieldnames}")
+    logger.debug(f"Parsed fieldnames: {fieldnames}")
     
     # Determine Mapping
     if profile:
@@ -338,153 +457,74 @@ def ingest_csv(
         # Verify the mapping has valid column names by checking against actual fieldnames
         # If not, fall back to auto-detection
         if not _validate_mapping(mapping, fieldnames):
-            print(f"Specified profile '{profile}' has columns that don't match CSV, trying auto-detection...")
+            logger.info(f"Specified profile '{profile}' has columns that don't match CSV, trying auto-detection...")
             mapping = _auto_map_columns(fieldnames)
     else:
         mapping = _auto_map_columns(fieldnames)
         
     # Check if we have minimum requirements
     if not mapping.get('date'):
-        print(f"Auto-mapping failed: No date column found in {fieldnames}")
-        print(f"Auto-mapping result: {mapping}")
+        logger.warning(f"Auto-mapping failed: No date column found in {fieldnames}")
+        logger.warning(f"Auto-mapping result: {mapping}")
         return 0, 0, 0
 
     if not (mapping.get('amount') or (mapping.get('debit') and mapping.get('credit'))):
-        print(f"Auto-mapping failed: No amount/debit+credit columns found in {fieldnames}")
-        print(f"Auto-mapping result: {mapping}")
+        logger.warning(f"Auto-mapping failed: No amount/debit+credit columns found in {fieldnames}")
+        logger.warning(f"Auto-mapping result: {mapping}")
         return 0, 0, 0
 
-    print(f"Using mapping: {mapping}")
+    logger.debug(f"Using mapping: {mapping}")
 
     inserted = 0
     skipped = 0
     duplicates = 0
-    rows_processed = 0  # Track total rows that were attempted
 
-    print(f"Starting row parsing with mapping: {mapping}")
+    logger.debug(f"Starting row parsing with mapping: {mapping}")
+    to_insert: List[tuple] = []
 
-    for i, row in enumerate(reader):
-        # Clean row keys/values - this matches the stripped fieldnames
-        row = {k.strip(): v for k, v in row.items() if k}
+    # Resolve mapped columns to positions once for the whole file; rows are
+    # then plain lists. Duplicate header names resolve to the last column.
+    header_positions = {raw.strip(): pos for pos, raw in enumerate(raw_fieldnames) if raw}
+    positions = {
+        field: header_positions[col]
+        for field, col in mapping.items()
+        if col and col in header_positions
+    }
+    build_row = _make_row_builder(positions, account_id, statement_id, user_id)
+    log_rows = logger.isEnabledFor(logging.DEBUG)
 
-        # Debug: print first 5 rows
-        if i < 5:
-            print(f"Row {i}: {row}")
-
-        # Extract Date
-        date_col = mapping['date']
-        date_val = row.get(date_col)
-        posted_at = parse_date(date_val)
-        if not posted_at:
-            skipped += 1
+    for i, row in enumerate(reader):
+        if not row:
             continue
 
-        # Extract Description
-        desc_col = mapping.get('description')
-        description_raw = row.get(desc_col, "Transaction") if desc_col else "Transaction"
-        description_norm = normalize_description(description_raw)
+        # Debug: log first 5 rows
+        if log_rows and i < 5:
+            logger.debug("Row %d: %s", i, row)
 
-        # Extract Amount
-        amount = _get_amount(row, mapping)
-        print(f"  -> Amount: {amount}")
-        if amount == 0:
-            print(f"  -> Skipped (amount is 0)")
+        values = build_row(row)
+        if values is None:
             skipped += 1
             continue
+        to_insert.append(values)
 
-        # Track that we processed this row (regardless of insert success)
-        rows_processed += 1
-
-        tx_hash = compute_hash(posted_at, amount, description_norm, user_id=user_id)
+    # Track rows that parsed (regardless of insert success)
+    rows_processed = len(to_insert)
 
-        try:
-            conn.execute(
-                """
-                INSERT INTO transactions (
-                    account_id, statement_id, posted_at, amount, currency,
-                    description_raw, description_norm, hash, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    account_id,
-                    statement_id,
-                    posted_at,
-                    amount,
-                    "INR",
-                    description_raw,
-                    description_norm,
-                    tx_hash,
-                    user_id,
-                ),
-            )
-            inserted += 1
-        except Exception as e:
-            if _is_duplicate_error(e):
-                # Transaction already exists - track separately from parsing failures
-                duplicates += 1
-                print(f"  -> Duplicate transaction (hash already exists)")
-            else:
-                skipped += 1
+    # Rows that already exist (re-uploaded statements) are dropped by ON CONFLICT
+    batch_inserted, batch_duplicates, batch_failed = insert_transactions(conn, to_insert)
+    inserted += batch_inserted
+    duplicates += batch_duplicates
+    skipped += batch_failed
 
     # Fallback: If no transactions inserted and auto-mapping failed,
     # try to parse raw data (unstructured CSV)
-    if inserted == 0 and profile is None:
-        print("Standard CSV parsing yielded 0 results - attempting raw data parsing...")
-        print(f"Lines to parse (starting from index {header_idx + 1}): {len(lines)}")
-        for i, line in enumerate(lines):
-            # Skip header-like lines
-            if header_idx > 0 and i <= header_idx:
-                continue
-
-            # Skip empty lines and lines that look like headers
-            line_lower = line.lower()
-            if any(x in line_lower for x in ['date', 'description', 'narration', 'particulars', 'amount', 'total']):
-                continue
-
-            # Split by delimiter and try to parse
-            row_values = [v.strip() for v in line.split(delimiter) if v.strip()]
-
-            if len(row_values) >= 2:
-                parsed = _parse_unstructured_csv_row(row_values)
-                if parsed:
-                    print(f"Parsed transaction: {parsed}")
-                    date_str, description, amount, is_credit = parsed
-
-                    if amount == 0:
-                        continue
-
-                    description_norm = normalize_description(description)
-                    tx_hash = compute_hash(date_str, amount, description_norm, user_id=user_id)
-
-                    try:
-                        conn.execute(
-                            """
-                            INSERT INTO transactions (
-                                account_id, statement_id, posted_at, amount, currency,
-                                description_raw, description_norm, hash, user_id
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                account_id,
-                                statement_id,
-                                date_str,
-                                amount,
-                                "INR",
-                                description,
-                                description_norm,
-                                tx_hash,
-                                user_id,
-                            ),
-                        )
-                        inserted += 1
-                        print(f"Inserted: {description[:30]}... {amount}")
-                    except Exception:
-                        skipped += 1
-
-        if inserted > 0:
-            print(f"Raw data parsing found {inserted} transactions")
-        else:
-            print("Raw data parsing found no transactions")
+    # Not when the mapped pass parsed rows that were all duplicates of earlier imports
+    if rows_processed == 0 and profile is None:
+        fallback_inserted, fallback_skipped = _fallback_unstructured_parse(
+            conn, payload, encoding, header_idx, delimiter, account_id, statement_id, user_id
+        )
+        inserted += fallback_inserted
+        skipped += fallback_skipped
 
     # Return inserted, skipped, duplicates
     # - inserted: number of new transactions inserted
@@ -1,33 +1,96 @@
 import hashlib
 import re
-from typing import Optional, Union
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Optional, Union
 
 from dateutil import parser
 from dateutil.parser import ParserError
 
 
+# DD/MM/YYYY or DD-MM-YYYY, the common statement layout. Only four-digit years
+# take the fast path; dateutil keeps handling two-digit years (century pivot),
+# month/day swaps such as 03/15/2024, ISO dates and free text.
+_DMY_RE = re.compile(r"(\d{1,2})([/-])(\d{1,2})\2(\d{4})")
+
+
 def parse_date(value: str) -> Optional[str]:
-    if not value or not str(value).strip():
+    if not value:
+        return None
+    text = str(value).strip()
+    if not text:
         return None
+    return _parse_date_text(text)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text: str) -> Optional[str]:
+    # Statements repeat the same date string on many rows; memoize per process
+    match = _DMY_RE.fullmatch(text)
+    if match:
+        day, month = int(match.group(1)), int(match.group(3))
+        if 1 <= day <= 31 and 1 <= month <= 12:
+            try:
+                return date(int(match.group(4)), month, day).isoformat()
+            except ValueError:
+                pass  # e.g. 31/04 - let dateutil decide
     try:
-        parsed = parser.parse(str(value), dayfirst=True, fuzzy=True)
+        parsed = parser.parse(text, dayfirst=True, fuzzy=True)
     except (ParserError, ValueError, TypeError):
         return None
     return parsed.date().isoformat()
 
 
+_sha256 = hashlib.sha256
+
+# Maps every ASCII character outside [A-Za-z0-9] to a space for the translate fast path
+_ASCII_NON_ALNUM_TO_SPACE = str.maketrans({
+    c: " " for c in map(chr, range(128)) if not c.isalnum()
+})
+_NON_ALNUM_RE = re.compile(r"[^A-Za-z0-9]+")
+
+_CURRENCY_PREFIX_RE = re.compile(r"^(Rs\.?|INR|₹|\$|€|£|¥)\s*", re.IGNORECASE)
+_CURRENCY_SUFFIX_RE = re.compile(r"\s*(Rs\.?|INR|₹|\$|€|£|¥)$", re.IGNORECASE)
+_CURRENCY_SYMBOL_RE = re.compile(r"[₹$€£¥]")
+_CURRENCY_SYMBOLS = "₹$€£¥"
+_DELETE_CURRENCY_SYMBOLS = str.maketrans("", "", _CURRENCY_SYMBOLS)
+# Word forms that need the prefix/suffix regexes; symbols alone take the translate path
+_CURRENCY_WORDS = ("rs", "inr")
+_CURRENCY_WORD_SUFFIXES = ("rs", "rs.", "inr")
+
+
 def normalize_description(text: str) -> str:
-    cleaned = re.sub(r"[^A-Za-z0-9]+", " ", text or "")
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
-    return cleaned.upper()
+    text = text or ""
+    if text.isascii():
+        # C-level translate + split/join gives the same result as the regex path
+        return " ".join(text.translate(_ASCII_NON_ALNUM_TO_SPACE).split()).upper()
+    return _NON_ALNUM_RE.sub(" ", text).strip().upper()
 
 
 def compute_hash(
     posted_at: str, amount: float, description_norm: str, user_id: int
 ) -> str:
-    # Hash is now user-scoped to prevent cross-user collisions while maintaining account-independence
+    # Hash is now user-scoped to prevent cross-user collisions while maintaining account-independence.
+    # It is the persisted dedup key (UNIQUE index), so the algorithm and format must stay
+    # SHA-256 hex: switching would make re-uploads of already imported statements look new.
     payload = f"{user_id}|{posted_at}|{amount:.2f}|{description_norm}"
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return _sha256(payload.encode()).hexdigest()
+
+
+def transaction_hasher(user_id: int) -> Callable[[str, float, str], str]:
+    """
+    Return compute_hash bound to one user, for hashing many rows of an import.
+    The "{user_id}|" prefix is hashed once and each row hashes from a copy of
+    that state, so digests are identical to compute_hash.
+    """
+    prefix = _sha256(f"{user_id}|".encode())
+
+    def hash_row(posted_at: str, amount: float, description_norm: str) -> str:
+        h = prefix.copy()
+        h.update(f"{posted_at}|{amount:.2f}|{description_norm}".encode())
+        return h.hexdigest()
+
+    return hash_row
 
 
 def parse_amount(value: Union[str, float, int, None]) -> float:
@@ -50,6 +113,18 @@ def parse_amount(value: Union[str, float, int, None]) -> float:
     text = str(value).strip()
     if not text:
         return 0.0
+    return _parse_amount_text(text)
+
+
+@lru_cache(maxsize=1024)
+def _parse_amount_text(text: str) -> float:
+    # Fee amounts, "0.00" and the like repeat across rows; memoize per process
+
+    # Fast path: plain numbers with optional sign and thousands separators
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        pass
     
     # Check for accounting format negative (parentheses)
     is_negative = False
@@ -62,18 +137,27 @@ def parse_amount(value: Union[str, float, int, None]) -> float:
         is_negative = True
         text = text[1:].strip()
     
-    # Remove currency prefixes (Rs., INR, ₹, etc.) - these are word patterns, not individual chars
-    text = re.sub(r"^(Rs\.?|INR|₹|\$|€|£|¥)\s*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s*(Rs\.?|INR|₹|\$|€|£|¥)$", "", text, flags=re.IGNORECASE)
-    
-    # Remove any remaining currency symbols (but NOT periods which are decimal separators)
-    text = re.sub(r"[₹$€£¥]", "", text)
+    lowered = text.lower()
+    if lowered.startswith(_CURRENCY_WORDS) or lowered.endswith(_CURRENCY_WORD_SUFFIXES):
+        # Remove currency prefixes (Rs., INR, ₹, etc.) - these are word patterns, not individual chars
+        text = _CURRENCY_PREFIX_RE.sub("", text)
+        text = _CURRENCY_SUFFIX_RE.sub("", text)
+
+        # Remove any remaining currency symbols (but NOT periods which are decimal separators)
+        text = _CURRENCY_SYMBOL_RE.sub("", text)
+    else:
+        # Symbols only: one C-level pass drops them all. Like the suffix regex, a
+        # trailing symbol also takes the whitespace before it (leading space is harmless).
+        if text[-1:] in _CURRENCY_SYMBOLS:
+            text = text[:-1].rstrip()
+        text = text.translate(_DELETE_CURRENCY_SYMBOLS)
     
     # Handle "Dr" (debit) and "Cr" (credit) suffixes common in Indian statements
-    if text.upper().endswith("DR"):
+    suffix = text[-2:].upper()
+    if suffix == "DR":
         is_negative = True
         text = text[:-2].strip()
-    elif text.upper().endswith("CR"):
+    elif suffix == "CR":
         is_negative = False
         text = text[:-2].strip()
     
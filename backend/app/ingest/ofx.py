@@ -1,50 +1,128 @@
+import datetime
+import decimal
+import html
 import io
-from typing import Tuple
+import re
+from typing import List, Optional, Tuple
 
 from ofxparse import OfxParser
 
-from app.ingest.normalize import compute_hash, normalize_amount, normalize_description
+from app.ingest.normalize import normalize_amount, normalize_description, transaction_hasher
+from app.ingest.store import insert_transactions
+
+# Fast scanner for the common case: one ASCII bank/card statement. Anything
+# it is not sure about (investment or multi-account files, non-ASCII
+# charsets, malformed transactions) falls back to ofxparse's full parser.
+_OFX_ROOT_RE = re.compile(rb"<OFX>", re.IGNORECASE)
+_STATEMENT_RE = re.compile(rb"<(STMTRS|CCSTMTRS|INVSTMTRS)>", re.IGNORECASE)
+_STMTTRN_OPEN_RE = re.compile(rb"<STMTTRN>", re.IGNORECASE)
+_STMTTRN_RE = re.compile(rb"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_CURDEF_RE = re.compile(rb"<CURDEF>([^<]*)", re.IGNORECASE)
+_FIELD_RE = re.compile(rb"<([A-Za-z0-9.]+)>([^<]*)")
+_TZ_RE = re.compile(r"\[(?P<tz>[-+]?\d+\.?\d*)\:\w*\]$")
+_FRACTION_RE = re.compile(r"^[0-9]*\.([0-9]{0,5})")
+_DOT_THEN_COMMA_RE = re.compile(r".*\..*,")
+_COMMA_THEN_DOT_RE = re.compile(r".*,.*\.")
+
+ScannedTransaction = Tuple[str, str, float]
+
+
+def _ofx_value(raw: bytes) -> str:
+    return html.unescape(raw.decode("ascii")).strip()
+
+
+def _ofx_amount(text: str) -> decimal.Decimal:
+    """Same number normalization as ofxparse's toDecimal."""
+    if _DOT_THEN_COMMA_RE.search(text):
+        text = text.replace(".", "")
+    if _COMMA_THEN_DOT_RE.search(text):
+        text = text.replace(",", "")
+    if "." not in text and "," in text:
+        text = text.replace(",", ".")
+    return decimal.Decimal(text.replace(" ", "").replace("+", ""))
+
+
+def _ofx_date(text: str) -> datetime.date:
+    """Same UTC conversion as ofxparse's parseOfxDateTime (offset, fractions)."""
+    tz_match = _TZ_RE.search(text)
+    offset = datetime.timedelta(hours=float(tz_match.group("tz")) if tz_match else 0)
+    fraction = _FRACTION_RE.search(text)
+    msec = datetime.timedelta(seconds=float("0." + fraction.group(1)) if fraction else 0)
+    try:
+        local = datetime.datetime.strptime(text[:14], "%Y%m%d%H%M%S")
+    except ValueError:
+        local = datetime.datetime.strptime(text[:8], "%Y%m%d")
+    return (local - offset + msec).date()
+
+
+def _scan_transactions(payload: bytes) -> Optional[Tuple[str, List[ScannedTransaction]]]:
+    """
+    Scan STMTTRN blocks straight from the payload bytes.
+    Returns (currency, [(posted_at, description_raw, amount)]) or None when the
+    file should go through ofxparse instead.
+    """
+    if not payload.isascii() or not _OFX_ROOT_RE.search(payload):
+        return None
+    if [m.group(1).upper() for m in _STATEMENT_RE.finditer(payload)] not in ([b"STMTRS"], [b"CCSTMTRS"]):
+        return None
+
+    blocks = _STMTTRN_RE.findall(payload)
+    if not blocks or len(blocks) != len(_STMTTRN_OPEN_RE.findall(payload)):
+        return None
+
+    curdef = _CURDEF_RE.search(payload)
+    currency = _ofx_value(curdef.group(1)).lower() if curdef else ""
+
+    transactions = []
+    for block in blocks:
+        fields = {}
+        for tag, value in _FIELD_RE.findall(block):
+            fields.setdefault(tag.upper(), value)
+        try:
+            fitid = _ofx_value(fields[b"FITID"])
+            posted_at = _ofx_date(_ofx_value(fields[b"DTPOSTED"])).isoformat()
+            amount = float(_ofx_amount(_ofx_value(fields[b"TRNAMT"])))
+        except (KeyError, ValueError, decimal.InvalidOperation):
+            return None
+        payee = _ofx_value(fields[b"NAME"]) if b"NAME" in fields else None
+        memo = _ofx_value(fields[b"MEMO"]) if b"MEMO" in fields else None
+        if not fitid or payee == "" or (b"TRNTYPE" in fields and not _ofx_value(fields[b"TRNTYPE"])):
+            return None
+        transactions.append((posted_at, payee or memo or "", amount))
+    return currency, transactions
+
+
+def _parse_with_ofxparse(payload: bytes) -> Tuple[str, List[ScannedTransaction]]:
+    ofx = OfxParser.parse(io.BytesIO(payload))
+    currency = ofx.account.statement.currency
+    transactions = [
+        (tx.date.date().isoformat(), tx.payee or tx.memo or "", float(tx.amount))
+        for tx in ofx.account.statement.transactions
+    ]
+    return currency, transactions
 
 
 def ingest_ofx(
     conn, account_id: int, statement_id: int, payload: bytes, user_id: int
 ) -> Tuple[int, int, int]:
-    inserted = 0
-    skipped = 0
-    duplicates = 0
-    ofx = OfxParser.parse(io.BytesIO(payload))
-    currency = ofx.account.statement.currency or "INR"
-    for tx in ofx.account.statement.transactions:
-        posted_at = tx.date.date().isoformat()
-        description_raw = tx.payee or tx.memo or ""
+    rows = []
+    scanned = _scan_transactions(payload)
+    currency, transactions = scanned if scanned is not None else _parse_with_ofxparse(payload)
+    currency = currency or "INR"
+    hash_row = transaction_hasher(user_id)
+    for posted_at, description_raw, amount in transactions:
         description_norm = normalize_description(description_raw)
-        amount = float(tx.amount)
-        tx_hash = compute_hash(posted_at, amount, description_norm, user_id=user_id)
-        try:
-            conn.execute(
-                """
-                INSERT INTO transactions (
-                    account_id, statement_id, posted_at, amount, currency,
-                    description_raw, description_norm, hash, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    account_id,
-                    statement_id,
-                    posted_at,
-                    normalize_amount(amount),
-                    currency,
-                    description_raw,
-                    description_norm,
-                    tx_hash,
-                    user_id,
-                ),
-            )
-            inserted += 1
-        except Exception as e:
-            error_msg = str(e)
-            if "UNIQUE" in error_msg.upper() or "duplicate" in error_msg.lower():
-                duplicates += 1
-            else:
-                skipped += 1
+        tx_hash = hash_row(posted_at, amount, description_norm)
+        rows.append((
+            account_id,
+            statement_id,
+            posted_at,
+            normalize_amount(amount),
+            currency,
+            description_raw,
+            description_norm,
+            tx_hash,
+            user_id,
+        ))
+    inserted, duplicates, skipped = insert_transactions(conn, rows)
     return inserted, skipped, duplicates
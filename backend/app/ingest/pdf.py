@@ -1,12 +1,22 @@
+import datetime
 import io
+import logging
 import re
 import os
-from typing import Optional, Tuple, List, Set
+import tempfile
+import threading
+from functools import lru_cache
+from itertools import chain
+from typing import Iterator, Optional, Tuple, List, Set
 
 import pdfplumber
+from dateutil import parser as date_parser
 
-from app.ingest.normalize import compute_hash, normalize_description, parse_amount, parse_date
+from app.ingest.normalize import normalize_description, parse_date, transaction_hasher
 from app.ingest.ai_parser import parse_with_gemini
+from app.ingest.store import insert_transactions
+
+logger = logging.getLogger(__name__)
 
 # Import new statement-parser package (optional)
 try:
@@ -15,58 +25,298 @@ try:
 except ImportError:
     STATEMENT_PARSER_AVAILABLE = False
 
+# StatementParser only parses files by path; write the upload to tmpfs (RAM)
+# when the platform has one, the default temp dir otherwise or when it is full
+_PARSER_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
 # Feature flag: USE_NEW_PARSER = True to use statement-parser package
 # Set via environment variable: USE_NEW_STATEMENT_PARSER=true
 USE_NEW_PARSER = os.environ.get("USE_NEW_STATEMENT_PARSER", "false").lower() in ("true", "1", "yes")
 
+# PyMuPDF (optional): much faster text extraction than pdfplumber/pdfminer
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# Feature flag: USE_PYMUPDF = True to extract page text with PyMuPDF when installed.
+# Its line breaks can differ from pdfplumber's on some layouts, so it is opt-in.
+# Set via environment variable: USE_PYMUPDF=true
+USE_PYMUPDF = os.environ.get("USE_PYMUPDF", "false").lower() in ("true", "1", "yes")
+
+# Worker processes for page text extraction (0/1 = extract in-process).
+# Only PDFs with at least PARALLEL_EXTRACT_MIN_PAGES pages use the pool,
+# since starting workers costs more than extracting a few pages. Platforms
+# that spawn rather than fork workers can raise the floor. Threads are no
+# substitute: pdfminer's layout analysis is pure Python and holds the GIL.
+# Set via environment variables: PDF_EXTRACT_WORKERS=4, PDF_PARALLEL_MIN_PAGES=16
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", "0") or 0)
+PARALLEL_EXTRACT_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "4") or 4)
+
+# Pages read per pdfplumber open; bounds memory on statements with hundreds of pages
+PDF_PAGE_SLOT_SIZE = 100
+
 # Date patterns
 DATE_PATTERN = re.compile(r"(\d{2}/\d{2}/\d{4})")
 
 # Pattern for amounts: handles 1,234.56 or 1234.56 with optional Cr/CR suffix
 AMOUNT_PATTERN = re.compile(r"([0-9,]+\.\d{2})\s*(Cr|CR)?$")
 
+# Per-card line patterns, compiled once instead of on every line
+# ICICI: AMOUNT [CR], any case
+ICICI_AMOUNT_PATTERN = re.compile(r"([0-9,]+\.\d{2})\s*(CR)?$", re.IGNORECASE)
+# SBI: "06 Oct 25" dates and AMOUNT D/C at the end
+SBI_DATE_PATTERN = re.compile(r"(\d{2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{2})", re.IGNORECASE)
+_SBI_MONTHS = {
+    "jan": "01", "feb": "02", "mar": "03", "apr": "04", "may": "05", "jun": "06",
+    "jul": "07", "aug": "08", "sep": "09", "oct": "10", "nov": "11", "dec": "12",
+}
+SBI_AMOUNT_PATTERN = re.compile(r"([0-9,]+\.\d{2})\s*([DC])\s*$", re.IGNORECASE)
+# Shortest line any card parser can accept: DD/MM/YYYY + 3 char description
+# + "1.00", or DD Mon YY + 3 chars + "1.00D". Shorter lines are labels.
+MIN_CARD_LINE_LENGTH = 17
+
+# Substrings (matched case-insensitively) that mark non-transaction lines
+HDFC_SKIP_KEYWORDS = ("statement date", "payment due", "credit limit", "available",
+                      "address", "email", "name:", "hsn code", "gstin",
+                      "personal details", "please write", "average daily",
+                      "fresh purchases")
+ICICI_SKIP_KEYWORDS = ("statement date", "payment due", "total amount", "minimum amount",
+                       "credit limit", "credit summary")
+SBI_SKIP_KEYWORDS = ("statement", "amount due", "credit limit", "available", "gstin",
+                     "period:", "date transaction", "for this")
+IXIGO_SKIP_KEYWORDS = ("statement", "total", "limit", "available", "opening", "closing",
+                       "payment due")
+IXIGO_SINGLE_LINE_SKIP_KEYWORDS = IXIGO_SKIP_KEYWORDS + ("thank you",)
+
+
+def _keyword_pattern(keywords: Tuple[str, ...]) -> re.Pattern:
+    """
+    One case-insensitive alternation over the keywords: a single scan finds any
+    of them without a lowercased copy of the line. ASCII folding matches what
+    `kw in line.lower()` found for these ASCII keywords.
+    """
+    return re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE | re.ASCII)
+
+
+HDFC_SKIP_PATTERN = _keyword_pattern(HDFC_SKIP_KEYWORDS)
+ICICI_SKIP_PATTERN = _keyword_pattern(ICICI_SKIP_KEYWORDS)
+SBI_SKIP_PATTERN = _keyword_pattern(SBI_SKIP_KEYWORDS)
+IXIGO_SKIP_PATTERN = _keyword_pattern(IXIGO_SKIP_KEYWORDS)
+IXIGO_SINGLE_LINE_SKIP_PATTERN = _keyword_pattern(IXIGO_SINGLE_LINE_SKIP_KEYWORDS)
+
+# Description cleanup, one sub per line
+# HDFC: leading HH:MM[:SS] time and trailing reward points
+HDFC_DESC_CLEANUP_PATTERN = re.compile(r"^\d{2}:\d{2}(?::\d{2})?\s*|\s+\d{1,3}$")
+# ICICI: leading reference number, trailing points/percentage (optionally after points)
+ICICI_DESC_CLEANUP_PATTERN = re.compile(r"^\d{10,12}\s*|(?:\s+\d{1,3})?\s+[-\d]+%?\s*$")
+NUMERIC_ONLY_PATTERN = re.compile(r"^[\d,.\s]+$")
+
+# Enhanced fallback parser
+# Line prefixes of summary rows; used with match(), so no anchors or trailing ".*$"
+ENHANCED_SKIP_PATTERN = re.compile(
+    r'(?:statement|total|payment.*due|credit.*limit|available.*balance'
+    r'|opening.*balance|closing.*balance|thank you|revised.*statement)',
+    re.IGNORECASE,
+)
+ENHANCED_AMOUNT_PATTERN = re.compile(r'([0-9,]+\.\d{2})\s*(Dr|Cr|DR|CR)?\s*$', re.IGNORECASE)
+# Common date prefixes: "DD Mon YYYY", "DD Mon YY", "DD/MM/YYYY"
+# "DD Mon YYYY" is tried before "DD Mon YY"; DD/MM/YYYY is found by DATE_PATTERN
+ENHANCED_MONTH_DATE_PATTERNS = (
+    re.compile(r'(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})'),
+    re.compile(r'(\d{1,2})\s+([A-Za-z]{3})\s+(\d{2})'),
+)
+# Date prefixes ("DD Mon YYYY", "DD Mon YY", "DD/MM/YYYY") stripped in that order in one pass
+ENHANCED_DATE_PREFIX_PATTERN = re.compile(
+    r'^(?:\d{1,2}\s+[A-Za-z]{3}\s+\d{4}\s*)?(?:\d{1,2}\s+[A-Za-z]{3}\s+\d{2}\s*)?(?:\d{2}/\d{2}/\d{4}\s*)?'
+)
+TRAILING_DIGITS_PATTERN = re.compile(r'[\d\s]+$')
+
+# Ixigo page parser
+IXIGO_DAY_AMOUNT_PATTERN = re.compile(r"^(\d{1,2})\s*(?:₹|Rs\.?)?\s*([0-9,]+\.\d{2})\s*(?:Dr|Cr)?\s*$", re.IGNORECASE)
+IXIGO_MONTH_LINE_PATTERN = re.compile(r"^[A-Za-z]{3}\s+\d{1,2}\s*(Dr|Cr|DR|CR)?.*$", re.IGNORECASE)
+IXIGO_DRCR_PATTERN = re.compile(r'(Dr|Cr|DR|CR)', re.IGNORECASE)
+IXIGO_MON_YEAR_PATTERN = re.compile(r'^([A-Za-z]{3}\s+\d{1,2})')
+IXIGO_NUMERIC_DESC_PATTERN = re.compile(r'^[\d\s\.]+$')
+IXIGO_SINGLE_LINE_PATTERN = re.compile(
+    r'^(\d{1,2})\s+'           # Day
+    r'([A-Za-z]{3})\s+'        # Month
+    r'(\d{2,4})\s+'            # Year
+    r'(.+?)\s+'                # Description (non-greedy)
+    r'([0-9,]+\.\d{2})\s*'     # Amount
+    r'(Dr|Cr|DR|CR|D|C)?$',    # Debit/Credit (optional)
+    re.IGNORECASE
+)
+IXIGO_DAY_PATTERN = re.compile(r'^(\d{1,2})\s*(₹|Rs\.?)?\s*([0-9,]+\.\d{2})\s*(Dr|Cr)?$', re.IGNORECASE)
+IXIGO_DATE_LINE_PATTERN = re.compile(r'^([A-Za-z]{3}\s+\d{1,2})\s*(Dr|Cr)?$', re.IGNORECASE)
+IXIGO_NUMERIC_LINE_PATTERN = re.compile(r'^[\d\s₹₹]+$')
+
+
+def _open_pymupdf(payload: bytes):
+    """
+    PyMuPDF document for the payload when it is available and enabled, else None.
+    Files PyMuPDF cannot open (damaged or unusual structure) also return None,
+    so they go through pdfplumber.
+    """
+    if not (PYMUPDF_AVAILABLE and USE_PYMUPDF):
+        return None
+    try:
+        return fitz.open(stream=payload, filetype="pdf")
+    except Exception as e:
+        logger.warning(f"PyMuPDF could not open PDF, falling back to pdfplumber: {e}")
+        return None
 
-def _detect_pdf_type(pdf) -> str:
-    """Detect if PDF is a credit card statement or bank statement."""
-    first_page_text = ""
-    for page in pdf.pages[:2]:
-        first_page_text += (page.extract_text() or "") + "\n"
-    
-    text_lower = first_page_text.lower()
-    
+
+def _page_texts_in_range(payload: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the plain text of pages [start, stop) in order.
+    Uses PyMuPDF when available and enabled, pdfplumber otherwise.
+    """
+    doc = _open_pymupdf(payload)
+    if doc is not None:
+        try:
+            end = doc.page_count if stop is None else min(stop, doc.page_count)
+            for page_idx in range(start, end):
+                # sort=True follows reading order, closest to pdfplumber's output
+                yield doc.load_page(page_idx).get_text("text", sort=True)
+        finally:
+            doc.close()
+        return
+
+    # pdfplumber keeps every Page object it builds until the PDF is closed, so
+    # pages are read in slots of PDF_PAGE_SLOT_SIZE, reopening the file per slot.
+    # A bounded page list only builds Page objects for those pages (1-based numbers).
+    slot_start = start
+    while stop is None or slot_start < stop:
+        slot_stop = slot_start + PDF_PAGE_SLOT_SIZE
+        if stop is not None:
+            slot_stop = min(slot_stop, stop)
+        read = 0
+        with pdfplumber.open(io.BytesIO(payload), pages=list(range(slot_start + 1, slot_stop + 1))) as pdf:
+            for page in pdf.pages:
+                text = page.extract_text() or ""
+                # Release the page's parsed layout objects before moving on
+                page.close()
+                read += 1
+                yield text
+        if read < slot_stop - slot_start:
+            return  # past the last page
+        slot_start = slot_stop
+
+
+def _count_pages(payload: bytes) -> int:
+    doc = _open_pymupdf(payload)
+    if doc is not None:
+        try:
+            return doc.page_count
+        finally:
+            doc.close()
+    with pdfplumber.open(io.BytesIO(payload)) as pdf:
+        return len(pdf.pages)
+
+
+# Set once per extraction worker so tasks only carry page ranges, not the PDF bytes
+_worker_payload: Optional[bytes] = None
+
+
+def _init_extract_worker(payload: bytes) -> None:
+    global _worker_payload
+    _worker_payload = payload
+
+
+def _extract_page_range(page_range: Tuple[int, int]) -> List[str]:
+    """Pool task: text of a contiguous page range, opening the PDF once per range."""
+    return list(_page_texts_in_range(_worker_payload, *page_range))
+
+
+def _iter_page_texts(payload: bytes, start: int = 0) -> Iterator[str]:
+    """
+    Yield the plain text of each PDF page from `start` on, in order.
+    Long PDFs are split into contiguous page ranges across a process pool
+    when PDF_EXTRACT_WORKERS is set; parsing and inserts stay in this process.
+    """
+    if PDF_EXTRACT_WORKERS > 1:
+        page_count = _count_pages(payload)
+        if page_count - start >= PARALLEL_EXTRACT_MIN_PAGES:
+            from concurrent.futures import ProcessPoolExecutor
+
+            workers = min(PDF_EXTRACT_WORKERS, os.cpu_count() or 1, page_count - start)
+            step = -(-(page_count - start) // workers)  # ceil
+            ranges = [(i, min(i + step, page_count)) for i in range(start, page_count, step)]
+            with ProcessPoolExecutor(
+                max_workers=len(ranges),
+                initializer=_init_extract_worker,
+                initargs=(payload,),
+            ) as executor:
+                # map() returns ranges in submission order, so pages stay in order
+                for texts in executor.map(_extract_page_range, ranges):
+                    yield from texts
+            return
+
+    yield from _page_texts_in_range(payload, start)
+
+
+def first_pages_texts(payload: bytes) -> Tuple[str, ...]:
+    """
+    Text of the first two pages, which is all statement and account detection
+    looks at. Not cached: a cache keyed on the upload would keep statements in
+    memory across requests and hash the whole payload on every lookup.
+    """
+    return tuple(_page_texts_in_range(payload, 0, 2))
+
+
+def _grouped_amount(text: str) -> float:
+    r"""
+    Value of a `[0-9,]+\.\d{2}` amount group. Such text only carries grouping
+    commas, so this equals parse_amount without its general-format handling.
+    """
+    return float(text.replace(",", ""))
+
+
+def _seen_key(tx_hash: str) -> int:
+    """
+    In-import dedup key: the first 64 bits of the hex digest as an int.
+    Smaller set entries than 64-char strings; the full hash still goes to the DB.
+    """
+    return int(tx_hash[:16], 16)
+
+
+def _has_bank_markers(compact: str) -> bool:
+    """Bank statement column labels (HDFC bank statement specific), in space-free text."""
+    return ("accountbranch" in compact or 
+            "withdrawalamt" in compact or 
+            "depositamt" in compact)
+
+
+def _pdf_type_from(text: str, text_lower: str, bank_markers: bool) -> str:
+    """Credit card statement or bank statement, from pre-lowered text."""
     # Credit card indicators
     if "credit card" in text_lower or "card statement" in text_lower:
         return "credit_card"
     
-    # Bank statement indicators (HDFC bank statement specific)
-    if ("accountbranch" in text_lower.replace(" ", "") or 
-        "withdrawalamt" in text_lower.replace(" ", "") or 
-        "depositamt" in text_lower.replace(" ", "")):
+    # Bank statement indicators
+    if bank_markers:
         return "bank"
     
     # If has transaction-like lines with dates, assume credit card
-    if DATE_PATTERN.search(first_page_text):
+    if DATE_PATTERN.search(text):
         return "credit_card"
     
     return "unknown"
 
 
-def _detect_card_type_from_text(text: str) -> str:
-    """Detect which bank's statement this is from text content."""
-    text_lower = text.lower()
-    
+def _card_type_from(text_lower: str, compact: str, bank_markers: bool) -> str:
+    """Which bank's statement this is, from pre-lowered text."""
     # Check for Savings/Bank Statement indicators FIRST
     # If found, return 'generic' to trigger AI parsing immediately
     # These keywords suggest a bank account statement, not a credit card
-    if ("accountbranch" in text_lower.replace(" ", "") or 
-        "withdrawalamt" in text_lower.replace(" ", "") or 
-        "depositamt" in text_lower.replace(" ", "") or
-        "closing balance" in text_lower):
+    if bank_markers or "closing balance" in text_lower:
         return "generic"
     
-    if "icici" in text_lower or "amazon" in text_lower.replace(" ", ""):
+    if "icici" in text_lower or "amazon" in compact:
         return "icici"
-    if "sbi card" in text_lower or "sbicard" in text_lower.replace(" ", ""):
+    if "sbi card" in text_lower or "sbicard" in compact:
         return "sbi"
     if "hdfc" in text_lower:
         return "hdfc"
@@ -77,12 +327,28 @@ def _detect_card_type_from_text(text: str) -> str:
     return "generic"
 
 
-def _detect_card_type(pdf) -> str:
-    """Detect which bank's credit card statement this is."""
-    first_page_text = ""
-    for page in pdf.pages[:2]:
-        first_page_text += (page.extract_text() or "") + "\n"
-    return _detect_card_type_from_text(first_page_text)
+def _detect_card_type_from_text(text: str) -> str:
+    """Detect which bank's statement this is from text content."""
+    text_lower = text.lower()
+    # Space-free copy for labels that PDF extraction may split ("Account Branch")
+    compact = text_lower.replace(" ", "")
+    return _card_type_from(text_lower, compact, _has_bank_markers(compact))
+
+
+def _detect(page_texts: List[str]) -> Tuple[str, str]:
+    """
+    Detect (pdf_type, card_type) from the first two pages' text.
+    Both checks share one joined, lowered and space-free copy of the text,
+    and the bank-statement labels they both look for are searched once.
+    """
+    text = "".join(page_text + "\n" for page_text in page_texts[:2])
+    text_lower = text.lower()
+    compact = text_lower.replace(" ", "")
+    bank_markers = _has_bank_markers(compact)
+    return (
+        _pdf_type_from(text, text_lower, bank_markers),
+        _card_type_from(text_lower, compact, bank_markers),
+    )
 
 
 def _parse_hdfc_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
@@ -93,17 +359,16 @@ def _parse_hdfc_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
     Example: 19/03/2025 10:34:29 TELE TRANSFER CREDIT (Ref# ...) 1,02,613.00Cr
     Returns: (date_str, description, amount, is_credit)
     """
-    # Must start with date
+    # Must start with date; without a '/' there is no DD/MM/YYYY and without a
+    # '.' no amount, so skip the regex (both are single memchr scans)
+    if "/" not in line or "." not in line:
+        return None
     date_match = DATE_PATTERN.search(line)
     if not date_match:
         return None
     
     # Skip non-transaction lines
-    skip_keywords = ["statement date", "payment due", "credit limit", "available", 
-                     "address", "email", "name:", "hsn code", "gstin", 
-                     "personal details", "please write", "average daily",
-                     "fresh purchases"]
-    if any(kw in line.lower() for kw in skip_keywords):
+    if HDFC_SKIP_PATTERN.search(line):
         return None
     
     # Find amount at end
@@ -112,27 +377,23 @@ def _parse_hdfc_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
         return None
     
     date_str = date_match.group(1)
-    amount = parse_amount(amount_match.group(1))
+    amount = _grouped_amount(amount_match.group(1))
     is_credit = amount_match.group(2) is not None  # Has Cr/CR suffix
     
     if amount <= 0:
         return None
     
     # Extract description: everything between date/time and amount
-    # Remove date
-    desc = line[date_match.end():].strip()
-    # Remove time if present (HH:MM:SS)
-    desc = re.sub(r"^\d{2}:\d{2}(:\d{2})?\s*", "", desc)
-    # Remove amount portion
-    desc = re.sub(r"[0-9,]+\.\d{2}\s*(Cr|CR)?$", "", desc).strip()
-    # Remove trailing points number if present (single digit or small number at end)
-    desc = re.sub(r"\s+\d{1,3}$", "", desc).strip()
+    # Slice between the date and amount matches instead of re-scanning for them
+    desc = line[date_match.end():amount_match.start()].strip()
+    # Remove time if present (HH:MM:SS) and trailing points number (small number at end)
+    desc = HDFC_DESC_CLEANUP_PATTERN.sub("", desc).strip()
     
     if not desc or len(desc) < 3:
         return None
     
     # Skip if description is just numbers (likely a parsing error)
-    if re.match(r'^[\d,.\s]+$', desc):
+    if NUMERIC_ONLY_PATTERN.match(desc):
         return None
     
     return date_str, desc, amount, is_credit
@@ -146,39 +407,35 @@ def _parse_icici_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
     Example: 13/04/2025 11082771581 BBPS Payment received 0 9,720.00 CR
     Returns: (date_str, description, amount, is_credit)
     """
-    # Must start with date
+    # Must start with date; without a '/' there is no DD/MM/YYYY and without a
+    # '.' no amount, so skip the regex (both are single memchr scans)
+    if "/" not in line or "." not in line:
+        return None
     date_match = DATE_PATTERN.search(line)
     if not date_match:
         return None
     
     # Skip headers and summary lines
-    skip_keywords = ["statement date", "payment due", "total amount", "minimum amount",
-                     "credit limit", "credit summary"]
-    if any(kw in line.lower() for kw in skip_keywords):
+    if ICICI_SKIP_PATTERN.search(line):
         return None
     
     # Find amount - look for number pattern at end
     # ICICI format: AMOUNT [CR] or just AMOUNT
-    amount_match = re.search(r"([0-9,]+\.\d{2})\s*(CR)?$", line, re.IGNORECASE)
+    amount_match = ICICI_AMOUNT_PATTERN.search(line)
     if not amount_match:
         return None
     
     date_str = date_match.group(1)
-    amount = parse_amount(amount_match.group(1))
+    amount = _grouped_amount(amount_match.group(1))
     is_credit = amount_match.group(2) is not None
     
     if amount <= 0:
         return None
     
-    # Extract description
-    desc = line[date_match.end():].strip()
-    # Remove reference number (11 digit number at start)
-    desc = re.sub(r"^\d{10,12}\s*", "", desc)
-    # Remove amount at end
-    desc = re.sub(r"[0-9,]+\.\d{2}\s*(CR)?$", "", desc, flags=re.IGNORECASE).strip()
-    # Remove trailing points/percentage
-    desc = re.sub(r"\s+[-\d]+%?\s*$", "", desc).strip()
-    desc = re.sub(r"\s+\d{1,3}$", "", desc).strip()
+    # Extract description (slice between the date and amount matches)
+    desc = line[date_match.end():amount_match.start()].strip()
+    # Remove reference number (11 digit number at start) and trailing points/percentage
+    desc = ICICI_DESC_CLEANUP_PATTERN.sub("", desc).strip()
     
     if not desc or len(desc) < 3:
         return None
@@ -186,6 +443,30 @@ def _parse_icici_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
     return date_str, desc, amount, is_credit
 
 
+@lru_cache(maxsize=1024)
+def _dayfirst_to_dmy(date_str: str) -> str:
+    """
+    Free-form day-first date ("12 Jan 26", "5 Mar 2025") -> "DD/MM/YYYY".
+    Raises like dateutil on unparseable input. Statements repeat the same few
+    dates, so results are memoized.
+    """
+    return date_parser.parse(date_str, dayfirst=True).strftime("%d/%m/%Y")
+
+
+def _sbi_date_to_dmy(date_str: str) -> str:
+    """
+    "06 Oct 25" -> "06/10/2025"; impossible dates are returned unchanged.
+    SBI_DATE_PATTERN already pins the shape, so a month lookup replaces dateutil.
+    """
+    day, month, year = date_str.split()
+    month = _SBI_MONTHS[month[:3].lower()]
+    try:
+        datetime.date(2000 + int(year), int(month), int(day))
+    except ValueError:
+        return date_str
+    return f"{day}/{month}/20{year}"
+
+
 def _parse_sbi_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
     """
     Parse SBI credit card line.
@@ -194,74 +475,44 @@ def _parse_sbi_line(line: str) -> Optional[Tuple[str, str, float, bool]]:
     Example: 03 Dec 25 CARD CASHBACK CREDIT 32.00 C
     Returns: (date_str, description, amount, is_credit)
     """
+    # Every SBI row has an amount and ends with a D/C marker; checking both is
+    # cheaper than the date regex
+    if "." not in line or line.rstrip()[-1:] not in ("D", "C", "d", "c"):
+        return None
     # SBI uses format like "06 Oct 25" - DD Mon YY
-    sbi_date_pattern = re.compile(r"(\d{2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{2})", re.IGNORECASE)
-    date_match = sbi_date_pattern.search(line)
+    date_match = SBI_DATE_PATTERN.search(line)
     if not date_match:
         return None
     
     # Skip headers and non-transaction lines
-    skip_keywords = ["statement", "amount due", "credit limit", "available", "gstin", 
-                     "period:", "date transaction", "for this"]
-    if any(kw in line.lower() for kw in skip_keywords):
+    if SBI_SKIP_PATTERN.search(line):
         return None
     
     # Find amount at end with D/C suffix: AMOUNT D or AMOUNT C
     # Pattern: number followed by D or C at end
-    amount_match = re.search(r"([0-9,]+\.\d{2})\s*([DC])\s*$", line, re.IGNORECASE)
+    amount_match = SBI_AMOUNT_PATTERN.search(line)
     if not amount_match:
         return None
     
     date_str = date_match.group(1)
-    amount = parse_amount(amount_match.group(1))
+    amount = _grouped_amount(amount_match.group(1))
     is_credit = amount_match.group(2).upper() == 'C'
     
     if amount <= 0:
         return None
     
-    # Extract description: everything between date and amount
-    desc = line[date_match.end():].strip()
-    # Remove amount and D/C marker
-    desc = re.sub(r"[0-9,]+\.\d{2}\s*[DC]\s*$", "", desc, flags=re.IGNORECASE).strip()
+    # Extract description: everything between date and amount (slice, no re-scan)
+    desc = line[date_match.end():amount_match.start()].strip()
     
     if not desc or len(desc) < 3:
         return None
     
     # Convert SBI date format to standard
-    # "06 Oct 25" -> "06/10/2025"
-    try:
-        from dateutil import parser as date_parser
-        parsed_date = date_parser.parse(date_str, dayfirst=True)
-        date_str = parsed_date.strftime("%d/%m/%Y")
-    except:
-        pass
+    date_str = _sbi_date_to_dmy(date_str)
     
     return date_str, desc, amount, is_credit
 
 
-def _parse_credit_card_line(line: str, card_type: str) -> Optional[Tuple[str, str, float, bool]]:
-    """Parse a credit card PDF line based on card type."""
-    if card_type == "hdfc":
-        return _parse_hdfc_line(line)
-    elif card_type == "icici":
-        return _parse_icici_line(line)
-    elif card_type == "sbi":
-        return _parse_sbi_line(line)
-    elif card_type == "ixigo":
-        # For ixigo, the multi-line pattern is handled at page level
-        # This function handles potential single-line matches
-        return _parse_ixigo_line_single(line)
-    else:
-        # Try all parsers
-        result = _parse_hdfc_line(line)
-        if result:
-            return result
-        result = _parse_icici_line(line)
-        if result:
-            return result
-        return _parse_sbi_line(line)
-
-
 def _parse_ixigo_line_single(line: str) -> Optional[Tuple[str, str, float, bool]]:
     """
     Parse a single line from Ixigo statement (for use in multi-line contexts).
@@ -272,6 +523,26 @@ def _parse_ixigo_line_single(line: str) -> Optional[Tuple[str, str, float, bool]
     return None
 
 
+# Line parser per card type detection can return, except generic (no regex pass)
+_LINE_PARSERS = {
+    "hdfc": _parse_hdfc_line,
+    "icici": _parse_icici_line,
+    "sbi": _parse_sbi_line,
+    # For ixigo, the multi-line pattern is handled at page level;
+    # this handles potential single-line matches
+    "ixigo": _parse_ixigo_line_single,
+}
+
+
+# Date each line parser requires; None for parsers that never match a single line
+_LINE_DATE_PATTERNS = {
+    "hdfc": DATE_PATTERN,
+    "icici": DATE_PATTERN,
+    "sbi": SBI_DATE_PATTERN,
+    "ixigo": None,
+}
+
+
 def _parse_enhanced_fallback(text: str, card_type: str) -> Optional[List[Tuple[str, str, float, bool]]]:
     """
     Enhanced fallback parser that tries multiple patterns to extract transactions
@@ -280,46 +551,30 @@ def _parse_enhanced_fallback(text: str, card_type: str) -> Optional[List[Tuple[s
     Uses a "learned pattern" approach - extracts what looks like a transaction
     and validates it matches the expected format.
     """
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    lines = [l for l in map(str.strip, text.splitlines()) if l]
     transactions = []
 
-    # Skip common non-transaction lines
-    skip_patterns = [
-        r'^statement.*$',
-        r'^total.*$',
-        r'^payment.*due.*$',
-        r'^credit.*limit.*$',
-        r'^available.*balance.*$',
-        r'^opening.*balance.*$',
-        r'^closing.*balance.*$',
-        r'^thank you.*$',
-        r'^revised.*statement.*$',
-    ]
-    skip_regex = re.compile('|'.join(skip_patterns), re.IGNORECASE)
-
     # Pattern 1: Look for lines with amounts at the end, preceded by a date-like pattern
     # Common format: "DD Mon YYYY DESC AMOUNT Dr/Cr" (single line)
-    amount_pattern = re.compile(r'([0-9,]+\.\d{2})\s*(Dr|Cr|DR|CR)?\s*$', re.IGNORECASE)
-
     for line in lines:
-        line = line.strip()
-
-        # Skip empty lines and headers
-        if not line or len(line) < 10:
+        # Skip short header lines (lines are already stripped and non-empty)
+        if len(line) < 10:
             continue
 
         # Skip if matches skip patterns
-        if skip_regex.match(line):
+        if ENHANCED_SKIP_PATTERN.match(line):
             continue
 
-        # Check if line ends with an amount
-        amount_match = amount_pattern.search(line)
+        # Check if line ends with an amount (it needs a '.', a cheap scan before the regex)
+        if "." not in line:
+            continue
+        amount_match = ENHANCED_AMOUNT_PATTERN.search(line)
         if not amount_match:
             continue
 
         amount_str = amount_match.group(1)
         drcr = amount_match.group(2) or 'dr'
-        amount = parse_amount(amount_str)
+        amount = _grouped_amount(amount_str)
 
         if amount == 0:
             continue
@@ -330,48 +585,29 @@ def _parse_enhanced_fallback(text: str, card_type: str) -> Optional[List[Tuple[s
         prefix = line[:amount_match.start()].strip()
 
         # Try to extract date from prefix
-        # Common patterns: "DD Mon YYYY", "DD Mon YY", "DD/MM/YYYY"
-        date_patterns = [
-            (r'^(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})', lambda m: f"{m.group(1)}/{m.group(2)}/{m.group(3)}"),
-            (r'^(\d{1,2})\s+([A-Za-z]{3})\s+(\d{2})', lambda m: f"{m.group(1)}/{m.group(2)}/20{m.group(3)}"),
-            (r'^(\d{2}/\d{2}/\d{4})', lambda m: m.group(1)),
-        ]
-
         description = prefix
         posted_at = None
 
-        for date_pattern, date_formatter in date_patterns:
-            date_match = re.search(date_pattern, prefix)
+        for date_pattern in ENHANCED_MONTH_DATE_PATTERNS:
+            date_match = date_pattern.match(prefix)
             if date_match:
                 try:
-                    from dateutil import parser as date_parser
-                    date_str = date_formatter(date_match)
-                    # Try parsing with different formats
-                    if '/' in date_str:
-                        # DD/MM/YYYY or DD Mon YYYY format
-                        if date_match.group(2).isalpha():
-                            # It's "DD Mon YYYY" format
-                            full_date = f"{date_match.group(1)} {date_match.group(2)} {date_match.group(3)}"
-                            parsed = date_parser.parse(full_date, dayfirst=True)
-                            posted_at = parsed.strftime("%d/%m/%Y")
-                        else:
-                            # It's DD/MM/YYYY format
-                            posted_at = date_str
-                        break
+                    # "DD Mon YYYY" / "DD Mon YY"
+                    posted_at = _dayfirst_to_dmy(" ".join(date_match.groups()))
+                    break
                 except Exception:
                     continue
 
         if not posted_at:
             # Try to find date anywhere in line
-            date_match = re.search(r'(\d{2}/\d{2}/\d{4})', line)
+            date_match = DATE_PATTERN.search(line)
             if date_match:
                 posted_at = date_match.group(1)
 
         if posted_at and description and amount != 0:
             # Clean up description
-            for date_pattern, _ in date_patterns:
-                description = re.sub(date_pattern, '', description).strip()
-            description = re.sub(r'[\d\s]+$', '', description).strip()
+            description = ENHANCED_DATE_PREFIX_PATTERN.sub('', description, count=1)
+            description = TRAILING_DIGITS_PATTERN.sub('', description).strip()
 
             if len(description) > 2:
                 transactions.append((posted_at, description, amount, is_credit))
@@ -402,7 +638,7 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
     3. Alternative amount format without ₹ symbol
     """
     transactions = []
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    lines = [l for l in map(str.strip, text.splitlines()) if l]
 
     # Pattern 1: Standard 3-line format
     # Line 1: Description (merchant name)
@@ -415,32 +651,32 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
         line3 = lines[i+2]    # Month Year + Dr/Cr
 
         # Skip lines that are likely headers or summary
-        if any(kw in line1.lower() for kw in ['statement', 'total', 'limit', 'available', 'opening', 'closing', 'payment due']):
+        if IXIGO_SKIP_PATTERN.search(line1):
             i += 1
             continue
 
         # Line 2 should match "DD" followed by amount (with or without ₹ symbol)
         # Pattern: starts with day (1-2 digits), then optional space, optional ₹, optional space, amount
-        line2_match = re.match(r"^(\d{1,2})\s*(?:₹|Rs\.?)?\s*([0-9,]+\.\d{2})\s*(?:Dr|Cr)?\s*$", line2, re.IGNORECASE)
+        line2_match = IXIGO_DAY_AMOUNT_PATTERN.match(line2)
 
         # Line 3 should match "Mon YY Dr/Cr" (optionally followed by extra content)
         # Example: "Jan 26 Dr" or "Jan 26 Cr 1015 RP" or "Jan 26" (day can be 1-2 digits)
-        line3_match = re.match(r"^[A-Za-z]{3}\s+\d{1,2}\s*(Dr|Cr|DR|CR)?.*$", line3, re.IGNORECASE)
+        line3_match = line2_match and IXIGO_MONTH_LINE_PATTERN.match(line3)
 
         if line2_match and line3_match:
             day = line2_match.group(1)
             amount_str = line2_match.group(2)
 
             # Get Dr/Cr from line 3 if present, otherwise check line 2
-            drcr_match = re.search(r'(Dr|Cr|DR|CR)', line3, re.IGNORECASE)
+            drcr_match = IXIGO_DRCR_PATTERN.search(line3)
             if not drcr_match:
-                drcr_match = re.search(r'(Dr|Cr|DR|CR)', line2, re.IGNORECASE)
+                drcr_match = IXIGO_DRCR_PATTERN.search(line2)
 
             drcr = drcr_match.group(1).lower() if drcr_match else "dr"  # Default to debit
 
             # Extract just "Mon YY" part from line3, excluding Dr/Cr and any extra content
             # line3 is like "Jan 26 Dr 1015 RP" or "Jan 26 Cr"
-            mon_year_match = re.match(r'^([A-Za-z]{3}\s+\d{1,2})', line3)
+            mon_year_match = IXIGO_MON_YEAR_PATTERN.match(line3)
             mon_year = mon_year_match.group(1) if mon_year_match else None
             if not mon_year:
                 # Fallback: get the first 7 characters (e.g., "Jan 26")
@@ -450,22 +686,20 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
             full_date_str = f"{day} {mon_year}"
 
             description = line1
-            amount = parse_amount(amount_str)
+            amount = _grouped_amount(amount_str)
             is_credit = drcr == "cr"
 
             # Convert date to DD/MM/YYYY
             try:
-                from dateutil import parser as date_parser
-                parsed_date = date_parser.parse(full_date_str, dayfirst=True)
-                date_fmt = parsed_date.strftime("%d/%m/%Y")
+                date_fmt = _dayfirst_to_dmy(full_date_str)
 
                 # Validate description is not empty or just a number
-                if description and len(description) > 2 and not re.match(r'^[\d\s\.]+$', description):
+                if description and len(description) > 2 and not IXIGO_NUMERIC_DESC_PATTERN.match(description):
                     transactions.append((date_fmt, description, amount, is_credit))
                 i += 3
                 continue
             except Exception as e:
-                print(f"Date parsing error for '{full_date_str}': {e}")
+                logger.debug("Date parsing error for %r: %s", full_date_str, e)
                 pass
 
         i += 1
@@ -473,27 +707,17 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
     # Pattern 2: Single-line format (fallback if 3-line pattern not found)
     # Format: "DD Mon YYYY DESCRIPTION AMOUNT Dr/Cr" or similar variations
     if not transactions:
-        print("Attempting single-line pattern parse for Ixigo statement")
-        single_line_pattern = re.compile(
-            r'^(\d{1,2})\s+'           # Day
-            r'([A-Za-z]{3})\s+'        # Month
-            r'(\d{2,4})\s+'            # Year
-            r'(.+?)\s+'                # Description (non-greedy)
-            r'([0-9,]+\.\d{2})\s*'     # Amount
-            r'(Dr|Cr|DR|CR|D|C)?$',    # Debit/Credit (optional)
-            re.IGNORECASE
-        )
+        logger.debug("Attempting single-line pattern parse for Ixigo statement")
 
         for line in lines:
-            line = line.strip()
-            if not line or len(line) < 10:
+            if len(line) < 10:
                 continue
 
             # Skip header/summary lines
-            if any(kw in line.lower() for kw in ['statement', 'total', 'limit', 'available', 'opening', 'closing', 'payment due', 'thank you']):
+            if IXIGO_SINGLE_LINE_SKIP_PATTERN.search(line):
                 continue
 
-            match = single_line_pattern.match(line)
+            match = IXIGO_SINGLE_LINE_PATTERN.match(line)
             if match:
                 day = match.group(1)
                 month = match.group(2)
@@ -508,13 +732,11 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
                     year = 2000 + year if year < 50 else 1900 + year
 
                 full_date_str = f"{day} {month} {year}"
-                amount = parse_amount(amount_str)
+                amount = _grouped_amount(amount_str)
                 is_credit = drcr.lower() == 'cr'
 
                 try:
-                    from dateutil import parser as date_parser
-                    parsed_date = date_parser.parse(full_date_str, dayfirst=True)
-                    date_fmt = parsed_date.strftime("%d/%m/%Y")
+                    date_fmt = _dayfirst_to_dmy(full_date_str)
 
                     if description and len(description) > 2:
                         transactions.append((date_fmt, description, amount, is_credit))
@@ -524,22 +746,20 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
     # Pattern 3: Extract dates and amounts separately, then combine
     # Useful for statements where date/amount are on separate lines
     if not transactions:
-        print("Attempting alternative pattern parse for Ixigo statement")
+        logger.debug("Attempting alternative pattern parse for Ixigo statement")
 
         # Find all potential transaction starts (lines starting with day number)
-        day_pattern = re.compile(r'^(\d{1,2})\s*(₹|Rs\.?)?\s*([0-9,]+\.\d{2})\s*(Dr|Cr)?$', re.IGNORECASE)
-
         i = 0
         while i < len(lines):
             line = lines[i]
 
             # Check if this line starts with a day number
-            day_match = day_pattern.match(line.strip())
+            day_match = IXIGO_DAY_PATTERN.match(line)
             if day_match and i + 1 < len(lines):
                 # Next line should be a date (Mon YY) and Dr/Cr
-                next_line = lines[i+1].strip()
+                next_line = lines[i+1]
                 # Support 1-2 digit day: "Jan 1" or "Jan 12"
-                date_match = re.match(r'^([A-Za-z]{3}\s+\d{1,2})\s*(Dr|Cr)?$', next_line, re.IGNORECASE)
+                date_match = IXIGO_DATE_LINE_PATTERN.match(next_line)
 
                 if date_match:
                     day = day_match.group(1)
@@ -550,23 +770,21 @@ def _parse_ixigo_page(text: str) -> List[Tuple[str, str, float, bool]]:
                     # Description is the line BEFORE the day+amount line (line i-1)
                     # e.g., "INDIAN OIL" is before "20 5,000.00"
                     if i > 0:
-                        description = lines[i-1].strip()
+                        description = lines[i-1]
                         # Skip if description looks like another date/amount
-                        if description and (re.match(r'^[\d\s₹₹]+$', description) or len(description) < 3):
+                        if description and (IXIGO_NUMERIC_LINE_PATTERN.match(description) or len(description) < 3):
                             # Try going back one more line
                             if i > 1:
-                                description = lines[i-2].strip()
+                                description = lines[i-2]
                     else:
                         description = "Transaction"
 
                     full_date_str = f"{day} {mon_year}"
-                    amount = parse_amount(amount_str)
+                    amount = _grouped_amount(amount_str)
                     is_credit = drcr.lower() == 'cr'
 
                     try:
-                        from dateutil import parser as date_parser
-                        parsed_date = date_parser.parse(full_date_str, dayfirst=True)
-                        date_fmt = parsed_date.strftime("%d/%m/%Y")
+                        date_fmt = _dayfirst_to_dmy(full_date_str)
 
                         if description and len(description) > 2:
                             transactions.append((date_fmt, description, amount, is_credit))
@@ -587,98 +805,116 @@ def process_page_text(
     text: str,
     card_type: str,
     user_id: int,
-    seen_hashes: Set[str]
+    seen_keys: Set[int],
+    seen_parsed: Set[tuple],
 ) -> Tuple[int, int]:
-    """Process extracted text from a page or file."""
+    """
+    Process extracted text from a page or file.
+    seen_keys and seen_parsed are shared across the pages of one import:
+    the _seen_key of each hash, and the raw parsed tuples that produced them.
+    """
     inserted = 0
     skipped = 0
+    hash_row = transaction_hasher(user_id)
 
     parsed_txs = []
+    # Valid rows the regex loop produced, including ones already imported
+    regex_found = 0
 
     # 1. Page Parsers (Ixigo - most robust for this format)
     if card_type == "ixigo":
         parsed_txs = _parse_ixigo_page(text)
         if parsed_txs:
-            print(f"Ixigo page parser found {len(parsed_txs)} transactions")
+            logger.info(f"Ixigo page parser found {len(parsed_txs)} transactions")
 
     # 2. Regex Loop (HDFC/ICICI/SBI/Ixigo single-line)
     # Only try regex if we haven't already parsed (via Ixigo) AND it's not generic
-    if not parsed_txs and card_type != "generic":
-        for line in text.splitlines():
+    if not parsed_txs and card_type in _LINE_PARSERS:
+        rows = []
+        parse_line = _LINE_PARSERS[card_type]
+        # Every parsed line contains its parser's date, so one scan of the whole
+        # page rules out cover and terms pages before any per-line work
+        page_date = _LINE_DATE_PATTERNS[card_type]
+        lines = text.splitlines() if page_date is not None and page_date.search(text) else ()
+        for line in lines:
             line = line.strip()
-            if not line:
+            if len(line) < MIN_CARD_LINE_LENGTH:
                 continue
 
-            parsed = _parse_credit_card_line(line, card_type)
+            parsed = parse_line(line)
             if not parsed:
                 continue
+            # Same parsed fields as an earlier line -> same hash; skip before hashing
+            if parsed in seen_parsed:
+                regex_found += 1
+                continue
 
             date_str, description_raw, amount, is_credit = parsed
             posted_at = parse_date(date_str)
             if not posted_at:
                 skipped += 1
                 continue
+            regex_found += 1
 
             description_norm = normalize_description(description_raw)
 
-            # Determine sign:
-            if is_credit:
-                amount = abs(amount)
-            else:
-                amount = -abs(amount)
+            # Determine sign (the line parsers only return positive amounts)
+            if not is_credit:
+                amount = -amount
 
-            tx_hash = compute_hash(posted_at, amount, description_norm, user_id=user_id)
+            tx_hash = hash_row(posted_at, amount, description_norm)
 
             # Skip duplicates within this import
-            if tx_hash in seen_hashes:
+            seen_key = _seen_key(tx_hash)
+            if seen_key in seen_keys:
                 continue
-            seen_hashes.add(tx_hash)
+            seen_keys.add(seen_key)
+            seen_parsed.add(parsed)
+
+            rows.append((
+                account_id,
+                statement_id,
+                posted_at,
+                amount,
+                "INR",
+                description_raw,
+                description_norm,
+                tx_hash,
+                user_id,
+            ))
 
-            try:
-                conn.execute(
-                    """
-                    INSERT INTO transactions (
-                        account_id, statement_id, posted_at, amount, currency,
-                        description_raw, description_norm, hash, user_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        account_id,
-                        statement_id,
-                        posted_at,
-                        amount,
-                        "INR",
-                        description_raw,
-                        description_norm,
-                        tx_hash,
-                        user_id,
-                    ),
-                )
-                inserted += 1
-            except Exception as e:
-                skipped += 1
+        # Insert the regex results now: the fallbacks below only run if none landed
+        ins, dup, failed = insert_transactions(conn, rows)
+        inserted += ins
+        skipped += dup + failed
 
     # 3. Enhanced Fallback Parser (for format variations)
-    # If regex didn't find transactions but we're not generic, try enhanced parsing
-    if not parsed_txs and inserted == 0 and card_type != "generic":
+    # If regex didn't find transactions but we're not generic, try enhanced parsing.
+    # Rows the regex found that were all duplicates (a re-uploaded statement)
+    # still count as found, so re-ingestion never reaches the fallbacks.
+    if not parsed_txs and inserted == 0 and not regex_found and card_type != "generic":
         enhanced_txs = _parse_enhanced_fallback(text, card_type)
         if enhanced_txs:
-            print(f"Enhanced fallback parser found {len(enhanced_txs)} transactions")
+            logger.info(f"Enhanced fallback parser found {len(enhanced_txs)} transactions")
             parsed_txs = enhanced_txs
 
     # 4. AI FALLBACK
     # If no transactions were inserted by Regex/Page/Enhanced parsers, try AI.
     # This handles "generic" types AND cases where specific parsers failed (misclassification or format change)
     # NOTE: Skip AI for "generic" type as it's likely a bank statement that won't parse well with AI
-    if not parsed_txs and inserted == 0 and card_type != "generic":
-        print("No transactions found by regex/enhanced - attempting AI parsing...")
+    if not parsed_txs and inserted == 0 and not regex_found and card_type != "generic":
+        logger.info("No transactions found by regex/enhanced - attempting AI parsing...")
         parsed_txs = parse_with_gemini(text)
         if parsed_txs:
-            print(f"AI found {len(parsed_txs)} transactions on page.")
+            logger.info(f"AI found {len(parsed_txs)} transactions on page.")
 
     # Loop to insert AI results (or parsed results)
     if parsed_txs:
+        rows = []
         for date_str, description_raw, amount, is_credit in parsed_txs:
+            raw_key = (date_str, description_raw, amount, is_credit)
+            if raw_key in seen_parsed:
+                continue
             posted_at = parse_date(date_str)
             if not posted_at:
                 skipped += 1
@@ -691,35 +927,29 @@ def process_page_text(
             else:
                 amount = -abs(amount)
 
-            tx_hash = compute_hash(posted_at, amount, description_norm, user_id=user_id)
+            tx_hash = hash_row(posted_at, amount, description_norm)
 
-            if tx_hash in seen_hashes:
+            seen_key = _seen_key(tx_hash)
+            if seen_key in seen_keys:
                 continue
-            seen_hashes.add(tx_hash)
+            seen_keys.add(seen_key)
+            seen_parsed.add(raw_key)
+
+            rows.append((
+                account_id,
+                statement_id,
+                posted_at,
+                amount,
+                "INR",
+                description_raw,
+                description_norm,
+                tx_hash,
+                user_id,
+            ))
 
-            try:
-                conn.execute(
-                    """
-                    INSERT INTO transactions (
-                        account_id, statement_id, posted_at, amount, currency,
-                        description_raw, description_norm, hash, user_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        account_id,
-                        statement_id,
-                        posted_at,
-                        amount,
-                        "INR",
-                        description_raw,
-                        description_norm,
-                        tx_hash,
-                        user_id,
-                    ),
-                )
-                inserted += 1
-            except Exception as e:
-                skipped += 1
+        ins, dup, failed = insert_transactions(conn, rows)
+        inserted += ins
+        skipped += dup + failed
 
     return inserted, skipped
 
@@ -738,11 +968,12 @@ def ingest_text(conn, account_id: int, statement_id: int, payload: bytes, user_i
             return 0, 0
             
     card_type = _detect_card_type_from_text(text)
-    print(f"Detected text statement type: {card_type}")
+    logger.debug(f"Detected text statement type: {card_type}")
     
-    seen_hashes = set()
+    seen_keys: Set[int] = set()
+    seen_parsed: Set[tuple] = set()
     
-    ins, skp = process_page_text(conn, account_id, statement_id, text, card_type, user_id, seen_hashes)
+    ins, skp = process_page_text(conn, account_id, statement_id, text, card_type, user_id, seen_keys, seen_parsed)
     total_inserted += ins
     total_skipped += skp
     
@@ -804,41 +1035,79 @@ def _save_parsed_pattern(conn, user_id: int, card_type: str, parsed_txs: List[Tu
         conn.commit()
     except Exception as e:
         # Table might not exist yet, which is fine
-        print(f"Could not save pattern: {e}")
+        logger.debug(f"Could not save pattern: {e}")
+
+
+_parser_local = threading.local()
+
+
+def _statement_parser():
+    """
+    One StatementParser per thread, built on first use rather than per upload.
+    Per thread because the package makes no thread-safety promise and the
+    upload endpoint is a sync FastAPI route, run on its threadpool.
+    """
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = _parser_local.parser = StatementParser()
+    return parser
+
+
+def _write_parser_temp_file(payload: bytes) -> str:
+    """
+    Write the upload to a temp file for StatementParser and return its path.
+    A partial file is removed if the write fails. If tmpfs is full (Docker
+    gives /dev/shm 64 MB) the default temp dir is tried next.
+    """
+    temp_dirs = (_PARSER_TEMP_DIR, None) if _PARSER_TEMP_DIR else (None,)
+    for temp_dir in temp_dirs:
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False, dir=temp_dir) as tmp:
+                tmp_path = tmp.name
+                tmp.write(payload)
+            return tmp_path
+        except Exception as e:
+            if tmp_path is not None:
+                os.unlink(tmp_path)
+            if temp_dir is None or not isinstance(e, OSError):
+                raise
+            logger.warning(f"Could not write PDF to {temp_dir} ({e}), using the default temp dir")
 
 
-def _ingest_with_new_parser(conn, account_id: int, statement_id: int, payload: bytes, user_id: int) -> Tuple[int, int, int]:
+def _ingest_with_new_parser(conn, account_id: int, statement_id: int, payload: bytes, user_id: int) -> Tuple[int, int, int, bool]:
     """
     Ingest PDF using the new expense-statement-parser package.
     
     This uses pattern-based parsing with optional AI fallback.
-    Returns: (inserted, skipped, transactions_found)
+    Returns: (inserted, skipped, transactions_found, already_imported)
+    already_imported is True when the parse produced rows and every one of
+    them was a duplicate of an earlier import.
     """
     inserted = 0
     skipped = 0
     transactions_found = 0
+    already_imported = False
     
     if not STATEMENT_PARSER_AVAILABLE:
-        print("New statement-parser package not available")
-        return 0, 0, 0
+        logger.info("New statement-parser package not available")
+        return 0, 0, 0, False
     
     try:
         # Save PDF to temp file for the package
-        import tempfile
-        
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
-            tmp.write(payload)
-            tmp_path = tmp.name
+        tmp_path = _write_parser_temp_file(payload)
         
         try:
             # Use the new package
-            parser = StatementParser()
+            parser = _statement_parser()
             result = parser.parse_file(tmp_path)
             
             transactions_found = len(result.transactions)
-            print(f"New parser detected: {result.statement_type} with {transactions_found} transactions")
+            logger.info(f"New parser detected: {result.statement_type} with {transactions_found} transactions")
             
-            seen_hashes = set()
+            seen_keys: Set[int] = set()
+            rows = []
+            hash_row = transaction_hasher(user_id)
             
             for tx in result.transactions:
                 # Extract date
@@ -874,40 +1143,32 @@ def _ingest_with_new_parser(conn, account_id: int, statement_id: int, payload: b
                     continue
                 
                 # Compute hash for deduplication
-                tx_hash = compute_hash(posted_at, amount, description_norm, user_id=user_id)
+                tx_hash = hash_row(posted_at, amount, description_norm)
                 
-                if tx_hash in seen_hashes:
+                seen_key = _seen_key(tx_hash)
+                if seen_key in seen_keys:
                     skipped += 1
                     continue
-                seen_hashes.add(tx_hash)
+                seen_keys.add(seen_key)
                 
-                # Insert transaction
-                try:
-                    conn.execute(
-                        """
-                        INSERT INTO transactions (
-                            account_id, statement_id, posted_at, amount, currency,
-                            description_raw, description_norm, hash, user_id
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            account_id,
-                            statement_id,
-                            posted_at,
-                            amount,
-                            "INR",
-                            description_raw,
-                            description_norm,
-                            tx_hash,
-                            user_id,
-                        ),
-                    )
-                    inserted += 1
-                except Exception as e:
-                    print(f"Error inserting transaction: {e}")
-                    skipped += 1
+                rows.append((
+                    account_id,
+                    statement_id,
+                    posted_at,
+                    amount,
+                    "INR",
+                    description_raw,
+                    description_norm,
+                    tx_hash,
+                    user_id,
+                ))
+
+            # Duplicates of earlier imports and failed rows both count as skipped
+            inserted, duplicates, failed = insert_transactions(conn, rows)
+            skipped += duplicates + failed
+            already_imported = bool(rows) and duplicates == len(rows)
             
-            print(f"New parser: {inserted} inserted, {skipped} skipped (from {transactions_found} found)")
+            logger.info(f"New parser: {inserted} inserted, {skipped} skipped (from {transactions_found} found)")
             
         finally:
             # Clean up temp file
@@ -917,10 +1178,10 @@ def _ingest_with_new_parser(conn, account_id: int, statement_id: int, payload: b
                 pass
                 
     except Exception as e:
-        print(f"New parser error: {e}")
-        return 0, 0, 0
+        logger.warning(f"New parser error: {e}")
+        return 0, 0, 0, False
     
-    return inserted, skipped, transactions_found
+    return inserted, skipped, transactions_found, already_imported
 
 
 def ingest_pdf(conn, account_id: int, statement_id: int, payload: bytes, user_id: int) -> Tuple[int, int]:
@@ -940,30 +1201,37 @@ def ingest_pdf(conn, account_id: int, statement_id: int, payload: bytes, user_id
     
     # Try new parser first (if available)
     if STATEMENT_PARSER_AVAILABLE:
-        print("[HYBRID] Trying NEW statement-parser package...")
+        logger.info("[HYBRID] Trying NEW statement-parser package...")
         try:
-            new_inserted, new_skipped, transactions_found = _ingest_with_new_parser(
+            new_inserted, new_skipped, transactions_found, already_imported = _ingest_with_new_parser(
                 conn, account_id, statement_id, payload, user_id
             )
             
             if new_inserted > 0:
-                print(f"[HYBRID] New parser succeeded: {new_inserted} transactions inserted")
+                logger.info(f"[HYBRID] New parser succeeded: {new_inserted} transactions inserted")
                 inserted = new_inserted
                 skipped = new_skipped
                 parser_used = "statement-parser"
                 parser_version = "0.1.1"
+            elif already_imported:
+                # Re-upload: the old parser would only find the same rows again,
+                # or near-duplicates where it reads descriptions differently
+                logger.info(f"[HYBRID] New parser found {transactions_found}, all already imported")
+                skipped = new_skipped
+                parser_used = "statement-parser"
+                parser_version = "0.1.1"
             else:
-                print(f"[HYBRID] New parser found {transactions_found} but inserted 0, will try old logic...")
+                logger.info(f"[HYBRID] New parser found {transactions_found} but inserted 0, will try old logic...")
                 
         except Exception as e:
-            print(f"[HYBRID] New parser failed: {e}")
+            logger.warning(f"[HYBRID] New parser failed: {e}")
             parser_error = str(e)[:500]  # Limit error message length
     else:
-        print("[HYBRID] New parser not available, using old logic...")
+        logger.info("[HYBRID] New parser not available, using old logic...")
     
     # Fall back to old logic if new parser didn't work
-    if inserted == 0:
-        print("[HYBRID] Falling back to OLD logic...")
+    if inserted == 0 and parser_used == "unknown":
+        logger.info("[HYBRID] Falling back to OLD logic...")
         try:
             old_inserted, old_skipped, old_found = _ingest_with_old_parser(
                 conn, account_id, statement_id, payload, user_id
@@ -973,10 +1241,10 @@ def ingest_pdf(conn, account_id: int, statement_id: int, payload: bytes, user_id
             transactions_found = old_found
             parser_used = "legacy"
             parser_version = "1.0"
-            print(f"[HYBRID] Old parser: {inserted} inserted, {skipped} skipped")
+            logger.info(f"[HYBRID] Old parser: {inserted} inserted, {skipped} skipped")
             
         except Exception as e:
-            print(f"[HYBRID] Old parser also failed: {e}")
+            logger.warning(f"[HYBRID] Old parser also failed: {e}")
             parser_error = f"New: {parser_error or 'N/A'} | Old: {str(e)[:200]}"
     
     # Update statement record with parser info
@@ -994,11 +1262,11 @@ def ingest_pdf(conn, account_id: int, statement_id: int, payload: bytes, user_id
             (parser_used, parser_version, transactions_found, inserted, parser_error, statement_id)
         )
         conn.commit()
-        print(f"[HYBRID] Updated statement {statement_id} with parser={parser_used}")
+        logger.debug(f"[HYBRID] Updated statement {statement_id} with parser={parser_used}")
     except Exception as e:
-        print(f"[HYBRID] Could not update statement record: {e}")
+        logger.warning(f"[HYBRID] Could not update statement record: {e}")
     
-    print(f"[HYBRID] Final: {inserted} inserted, {skipped} skipped (using {parser_used})")
+    logger.info(f"[HYBRID] Final: {inserted} inserted, {skipped} skipped (using {parser_used})")
     return inserted, skipped
 
 
@@ -1011,25 +1279,29 @@ def _ingest_with_old_parser(conn, account_id: int, statement_id: int, payload: b
     skipped = 0
     found = 0
     
-    with pdfplumber.open(io.BytesIO(payload)) as pdf:
-        pdf_type = _detect_pdf_type(pdf)
+    # Detection only needs the first two pages; their text is reused for the main loop
+    head = list(first_pages_texts(payload))
+    page_texts = _iter_page_texts(payload, start=len(head))
+    try:
+        pdf_type, card_type = _detect(head)
         
         if pdf_type == "bank":
-            print(f"Detected bank statement PDF - attempting generic parsing")
+            logger.info("Detected bank statement PDF - attempting generic parsing")
         
-        card_type = _detect_card_type(pdf)
-        print(f"Detected card type: {card_type}")
+        logger.debug(f"Detected card type: {card_type}")
         
-        seen_hashes = set()
+        seen_keys: Set[int] = set()
+        seen_parsed: Set[tuple] = set()
         
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            ins, skp = process_page_text(conn, account_id, statement_id, text, card_type, user_id, seen_hashes)
+        for text in chain(head, page_texts):
+            ins, skp = process_page_text(conn, account_id, statement_id, text, card_type, user_id, seen_keys, seen_parsed)
             inserted += ins
             skipped += skp
             found += ins + skp  # Count all potential transactions found
         
         if inserted > 0:
             _save_parsed_pattern(conn, user_id, card_type, [])
+    finally:
+        page_texts.close()
     
     return inserted, skipped, found
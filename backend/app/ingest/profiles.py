@@ -136,17 +136,19 @@ def detect_profile(columns: list) -> Dict[str, str]:
     Auto-detect column mapping from actual column names.
     Returns a mapping dict suitable for data extraction.
     """
-    columns_lower = [str(c).lower().strip() for c in columns]
+    # One NUL-joined string: `alias in joined` tests every column in a single
+    # C-level scan, and no alias contains the separator, so a hit always lies
+    # inside one column. The leftmost hit is in the first matching column.
+    # NULs inside names become \x01, which no alias contains either.
+    joined = "\0".join(str(c).lower().strip().replace("\0", "\x01") for c in columns)
     mapping = {}
 
     for field, aliases in COLUMN_ALIASES.items():
         for alias in aliases:
-            for i, col in enumerate(columns_lower):
-                if alias in col:
-                    original_col = columns[i]
-                    mapping[field] = original_col  # Use original column name
-                    break
-            if field in mapping:
+            pos = joined.find(alias)
+            if pos != -1:
+                # Use original column name
+                mapping[field] = columns[joined.count("\0", 0, pos)]
                 break
 
     return mapping
@@ -0,0 +1,100 @@
+"""Shared transaction insert path for the statement ingesters."""
+import logging
+import sqlite3
+from typing import Sequence, Tuple
+
+# Rows are (account_id, statement_id, posted_at, amount, currency,
+#           description_raw, description_norm, hash, user_id).
+# ON CONFLICT DO NOTHING works on both SQLite and PostgreSQL, so duplicates
+# are dropped by the database instead of raising one error per row.
+INSERT_TRANSACTION_SQL = (
+    "INSERT INTO transactions ("
+    "account_id, statement_id, posted_at, amount, currency, "
+    "description_raw, description_norm, hash, user_id"
+    ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT DO NOTHING"
+)
+
+INSERT_BATCH_SIZE = 1000
+
+# SQLITE_CONSTRAINT_PRIMARYKEY / SQLITE_CONSTRAINT_UNIQUE extended result codes
+_SQLITE_DUPLICATE_CODES = (1555, 2067)
+# PostgreSQL unique_violation SQLSTATE
+_PG_UNIQUE_VIOLATION = "23505"
+
+logger = logging.getLogger(__name__)
+
+
+def _is_duplicate_error(e: Exception) -> bool:
+    """
+    Check if exception is a duplicate/unique constraint violation.
+    ON CONFLICT DO NOTHING should drop those before they raise; this keeps a
+    row that still hits one counted as a duplicate rather than a failure.
+    """
+    # Driver error codes first; the message is only a fallback for drivers without them
+    if isinstance(e, sqlite3.Error) and getattr(e, "sqlite_errorcode", None) is not None:
+        return e.sqlite_errorcode in _SQLITE_DUPLICATE_CODES
+    pgcode = getattr(e, "pgcode", None)
+    if pgcode is not None:
+        return pgcode == _PG_UNIQUE_VIOLATION
+    error_msg = str(e)
+    # SQLite uses "UNIQUE constraint failed"
+    # PostgreSQL uses "duplicate key value violates unique constraint"
+    return "UNIQUE" in error_msg.upper() or "duplicate" in error_msg.lower()
+
+
+def _execute_guarded(conn, rows: Sequence[tuple]):
+    """
+    executemany inside a savepoint.
+    A failed executemany only undoes the row that failed: on SQLite the rows
+    it had already inserted stay, and PostgreSQL aborts the whole transaction.
+    Rolling back to the savepoint leaves neither, so a retry starts clean
+    and the rows already inserted by earlier batches of this import are kept.
+    executemany is used even for a single row: the PostgreSQL wrapper's
+    execute() rolls back the entire transaction when an INSERT fails.
+    """
+    if isinstance(conn, sqlite3.Connection) and not conn.in_transaction:
+        # Outside a transaction SAVEPOINT starts one and RELEASE would commit
+        # it; open the caller's transaction first so the commit stays theirs
+        conn.execute("BEGIN")
+    conn.execute("SAVEPOINT insert_transactions")
+    try:
+        cursor = conn.executemany(INSERT_TRANSACTION_SQL, rows)
+    except Exception:
+        conn.execute("ROLLBACK TO SAVEPOINT insert_transactions")
+        conn.execute("RELEASE SAVEPOINT insert_transactions")
+        raise
+    conn.execute("RELEASE SAVEPOINT insert_transactions")
+    return cursor
+
+
+def insert_transactions(conn, rows: Sequence[tuple]) -> Tuple[int, int, int]:
+    """
+    Insert transaction rows with executemany in batches.
+    Returns (inserted, duplicates, failed).
+
+    The caller owns the transaction (commit/rollback), as with the per-row
+    inserts this replaces. If a batch fails for a reason other than a
+    duplicate, it is retried row by row so one bad row only costs itself;
+    a row that raises a unique violation is counted as a duplicate.
+    """
+    inserted = 0
+    failed = 0
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start:start + INSERT_BATCH_SIZE]
+        try:
+            cursor = _execute_guarded(conn, batch)
+            inserted += max(cursor.rowcount, 0)
+        except Exception as e:
+            logger.warning(f"Batch insert failed ({e}), retrying row by row")
+            for values in batch:
+                try:
+                    cursor = _execute_guarded(conn, [values])
+                    inserted += max(cursor.rowcount, 0)
+                except Exception as row_error:
+                    if _is_duplicate_error(row_error):
+                        continue
+                    logger.warning(f"Could not insert transaction {values[7]}: {row_error}")
+                    failed += 1
+    duplicates = len(rows) - inserted - failed
+    return inserted, duplicates, failed
@@ -2,23 +2,17 @@ from typing import Optional, Tuple
 import io
 
 import pandas as pd
+from pandas.io.parsers import TextParser
 
 from app.ingest.normalize import (
-    compute_hash,
     normalize_amount,
     normalize_description,
     parse_amount,
     parse_date,
+    transaction_hasher,
 )
 from app.ingest.profiles import resolve_profile, detect_profile
-
-
-def _is_duplicate_error(e: Exception) -> bool:
-    """Check if exception is a duplicate/unique constraint violation."""
-    error_msg = str(e)
-    # SQLite uses "UNIQUE constraint failed"
-    # PostgreSQL uses "duplicate key value violates unique constraint"
-    return "UNIQUE" in error_msg.upper() or "duplicate" in error_msg.lower()
+from app.ingest.store import insert_transactions
 
 
 def _find_header_row(df: pd.DataFrame) -> int:
@@ -67,6 +61,34 @@ def _clean_dataframe(df: pd.DataFrame, header_row: int) -> pd.DataFrame:
     return new_df
 
 
+def _column_position(columns: pd.Index, name) -> Optional[int]:
+    """Position of a mapped column (the first one if the header repeats), None if absent."""
+    if name is None or name not in columns:
+        return None
+    for position, column in enumerate(columns):
+        if column == name:
+            return position
+    return None
+
+
+def _present(value) -> bool:
+    """
+    pd.notna for the scalars read_excel produces (None, NaN, NaT or a value),
+    without its per-call dispatch: NaN and NaT are the values unequal to themselves.
+    """
+    return value is not None and value == value
+
+
+def _read_with_first_row_header(df_raw: pd.DataFrame, payload: bytes) -> pd.DataFrame:
+    """Same frame as pd.read_excel(payload), reusing df_raw's cells when it can."""
+    if not df_raw.empty and all(isinstance(name, str) for name in df_raw.iloc[0]):
+        # Every column has a text header, so every df_raw column kept its cells
+        # as read. Run the same header/type handling read_excel(header=0) uses
+        # on those rows instead of parsing the workbook a second time.
+        return TextParser(df_raw.values.tolist(), header=0, skip_blank_lines=False).read()
+    return pd.read_excel(io.BytesIO(payload))
+
+
 def ingest_xls(
     conn,
     account_id: int,
@@ -83,7 +105,7 @@ def ingest_xls(
     if header_row > 0:
         df = _clean_dataframe(df_raw, header_row)
     else:
-        df = pd.read_excel(io.BytesIO(payload))
+        df = _read_with_first_row_header(df_raw, payload)
     
     # Get column list and auto-detect mapping
     columns = [str(c) for c in df.columns.tolist()]
@@ -96,22 +118,43 @@ def ingest_xls(
             if key not in mapping:
                 mapping[key] = profile_mapping[key]
     
-    inserted = 0
     skipped = 0
+    rows = []
+    hash_row = transaction_hasher(user_id)
+
+    # Resolve the mapped columns to positions once instead of per row
+    date_pos = _column_position(df.columns, mapping.get("date", "Date"))
+    desc_pos = _column_position(df.columns, mapping.get("description", "Narration"))
+    amount_col = mapping.get("amount")
+    debit_col = mapping.get("debit")
+    credit_col = mapping.get("credit")
+    amount_pos = _column_position(df.columns, amount_col) if amount_col else None
+    debit_pos = _column_position(df.columns, debit_col) if debit_col else None
+    credit_pos = _column_position(df.columns, credit_col) if credit_col else None
+
+    # iterrows() builds a Series from each row of df.values; slicing the mapped
+    # columns out of the same array once yields the same cell values without
+    # a per-row Series or row view
+    values = df.to_numpy()
+    missing = [None] * len(values)
+    date_vals = values[:, date_pos] if date_pos is not None else [""] * len(values)
+    desc_vals = values[:, desc_pos] if desc_pos is not None else [""] * len(values)
+    amount_vals = values[:, amount_pos] if amount_pos is not None else missing
+    debit_vals = values[:, debit_pos] if debit_pos is not None else missing
+    credit_vals = values[:, credit_pos] if credit_pos is not None else missing
 
-    for _, row in df.iterrows():
+    for date_val, desc_val, amount_val, debit_val, credit_val in zip(
+        date_vals, desc_vals, amount_vals, debit_vals, credit_vals
+    ):
         # Get date
-        date_col = mapping.get("date", "Date")
-        date_val = row.get(date_col, "")
-        posted_at = parse_date(str(date_val)) if pd.notna(date_val) else None
+        posted_at = parse_date(str(date_val)) if _present(date_val) else None
         
         if not posted_at:
             skipped += 1
             continue
         
         # Get description
-        desc_col = mapping.get("description", "Narration")
-        description_raw = str(row.get(desc_col, "") or "")
+        description_raw = str(desc_val or "")
         description_norm = normalize_description(description_raw)
         
         if not description_norm:
@@ -120,27 +163,20 @@ def ingest_xls(
         
         # Get amount - handle separate debit/credit columns or single amount column
         amount = 0.0
-        amount_col = mapping.get("amount")
-        debit_col = mapping.get("debit")
-        credit_col = mapping.get("credit")
         
         if amount_col:
-            amount_val = row.get(amount_col)
-            if pd.notna(amount_val) and str(amount_val).strip():
+            if _present(amount_val) and str(amount_val).strip():
                 amount = parse_amount(amount_val)
         
         if amount == 0.0 and (debit_col or credit_col):
-            debit_val = row.get(debit_col) if debit_col else None
-            credit_val = row.get(credit_col) if credit_col else None
-            
             # Check debit first (withdrawal = negative amount)
-            if debit_val is not None and pd.notna(debit_val):
+            if _present(debit_val):
                 debit_parsed = parse_amount(debit_val)
                 if debit_parsed != 0.0:
                     amount = -abs(debit_parsed)
             
             # Then check credit (deposit = positive amount)
-            if amount == 0.0 and credit_val is not None and pd.notna(credit_val):
+            if amount == 0.0 and _present(credit_val):
                 credit_parsed = parse_amount(credit_val)
                 if credit_parsed != 0.0:
                     amount = abs(credit_parsed)
@@ -150,34 +186,22 @@ def ingest_xls(
             continue
         
         currency = "INR"
-        tx_hash = compute_hash(posted_at, amount, description_norm, user_id=user_id)
-
-        try:
-            conn.execute(
-                """
-                INSERT INTO transactions (
-                    account_id, statement_id, posted_at, amount, currency,
-                    description_raw, description_norm, hash, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    account_id,
-                    statement_id,
-                    posted_at,
-                    normalize_amount(amount),
-                    currency,
-                    description_raw,
-                    description_norm,
-                    tx_hash,
-                    user_id,
-                ),
-            )
-            inserted += 1
-        except Exception as e:
-            if _is_duplicate_error(e):
-                print(f"  -> Duplicate transaction (hash already exists)")
-            else:
-                skipped += 1
+        tx_hash = hash_row(posted_at, amount, description_norm)
+
+        rows.append((
+            account_id,
+            statement_id,
+            posted_at,
+            normalize_amount(amount),
+            currency,
+            description_raw,
+            description_norm,
+            tx_hash,
+            user_id,
+        ))
+
+    inserted, duplicates, failed = insert_transactions(conn, rows)
+    skipped += failed
 
     # Return inserted, skipped, duplicates (duplicates not counted in skipped)
-    return inserted, skipped, 0  # Return 0 for duplicates as XLS parsing doesn't have same issue
+    return inserted, skipped, duplicates
@@ -1,6 +1,8 @@
-from datetime import datetime, timedelta, date
+from datetime import datetime, date
 from typing import Optional, List, Dict
 
+from app.db import IS_POSTGRES
+
 
 def _to_float(val):
     """Ensure value is a float."""
@@ -23,96 +25,47 @@ def _to_datetime(val):
 
 def link_card_payments(conn, account_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
     """Link credit card bill payments from bank to card accounts."""
-    
-    # Bank payments query - only filter by user, not account_id
+    # Bank payments are only filtered by user, card transactions by account and user
+    bank_clause = " AND b.user_id = ?" if user_id is not None else ""
+    card_clause = ""
+    params: List = [user_id] if user_id is not None else []
+    if account_id is not None:
+        card_clause += " AND c.account_id = ?"
+        params.append(account_id)
     if user_id is not None:
-        bank_payments = conn.execute(
-            """
-            SELECT t.id, t.posted_at, t.amount, t.description_norm
-            FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE a.type = 'bank'
-              AND t.description_norm LIKE '%%CARD%%PAYMENT%%'
-              AND t.user_id = ?
-            """,
-            (user_id,),
-        ).fetchall()
-    else:
-        bank_payments = conn.execute(
-            """
-            SELECT t.id, t.posted_at, t.amount, t.description_norm
-            FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE a.type = 'bank'
-              AND t.description_norm LIKE '%%CARD%%PAYMENT%%'
-            """
-        ).fetchall()
+        card_clause += " AND c.user_id = ?"
+        params.append(user_id)
 
-    # Card transactions query - filter by both account_id and user_id if provided
-    if account_id is not None and user_id is not None:
-        card_transactions = conn.execute(
-            """
-            SELECT t.id, t.posted_at, t.amount
-            FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE a.type = 'card'
-              AND t.account_id = ?
-              AND t.user_id = ?
-            """,
-            (account_id, user_id),
-        ).fetchall()
-    elif account_id is not None:
-        card_transactions = conn.execute(
-            """
-            SELECT t.id, t.posted_at, t.amount
-            FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE a.type = 'card'
-              AND t.account_id = ?
-            """,
-            (account_id,),
-        ).fetchall()
-    elif user_id is not None:
-        card_transactions = conn.execute(
-            """
-            SELECT t.id, t.posted_at, t.amount
-            FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE a.type = 'card'
-              AND t.user_id = ?
-            """,
-            (user_id,),
-        ).fetchall()
+    # posted_at is DATE on PostgreSQL and an ISO 'YYYY-MM-DD' string on SQLite;
+    # both forms keep the comparison on the bare column so its index applies.
+    if IS_POSTGRES:
+        date_window = "c.posted_at BETWEEN b.posted_at - 5 AND b.posted_at + 5"
     else:
-        card_transactions = conn.execute(
-            """
-            SELECT t.id, t.posted_at, t.amount
-            FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE a.type = 'card'
-            """
-        ).fetchall()
+        date_window = "c.posted_at BETWEEN date(b.posted_at, '-5 days') AND date(b.posted_at, '+5 days')"
 
-    for payment in bank_payments:
-        payment_date = _to_datetime(payment["posted_at"])
-        window_start = (payment_date - timedelta(days=5)).date()
-        window_end = (payment_date + timedelta(days=5)).date()
-        matches = [
-            tx
-            for tx in card_transactions
-            if window_start <= tx["posted_at"] <= window_end
-            and abs(abs(tx["amount"]) - abs(payment["amount"])) < 0.01
-        ]
-        for match in matches:
-            conn.execute(
-                """
-                INSERT INTO transaction_links
-                (source_transaction_id, target_transaction_id, link_type)
-                VALUES (?, ?, 'card_payment')
-                ON CONFLICT DO NOTHING
-                """,
-                (payment["id"], match["id"]),
-            )
+    # The whole match runs in the database: the BETWEEN on ABS(c.amount) can use
+    # the expression index, the last condition compares whole cents exactly
+    # (a float difference of two REAL amounts a cent apart can come out < 0.01).
+    conn.execute(
+        f"""
+        INSERT INTO transaction_links
+        (source_transaction_id, target_transaction_id, link_type)
+        SELECT b.id, c.id, 'card_payment'
+        FROM transactions b
+        JOIN accounts ab ON ab.id = b.account_id
+        JOIN transactions c ON {date_window}
+        JOIN accounts ac ON ac.id = c.account_id
+        WHERE ab.type = 'bank'
+          AND b.description_norm LIKE '%%CARD%%PAYMENT%%'
+          {bank_clause}
+          AND ac.type = 'card'
+          {card_clause}
+          AND ABS(c.amount) BETWEEN ABS(b.amount) - 0.01 AND ABS(b.amount) + 0.01
+          AND ROUND(ABS(c.amount) * 100) = ROUND(ABS(b.amount) * 100)
+        ON CONFLICT DO NOTHING
+        """,
+        params,
+    )
 
 
 def find_potential_transfers(conn, days_window: int = 7, user_id: Optional[int] = None) -> List[Dict]:
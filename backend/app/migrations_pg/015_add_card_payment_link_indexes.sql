@@ -0,0 +1,8 @@
+/*
+Indexes for link_card_payments (PostgreSQL).
+Card transactions are matched by account and a +/-5 day posted_at window,
+then by absolute amount.
+*/
+
+CREATE INDEX IF NOT EXISTS idx_transactions_account_posted ON transactions(account_id, posted_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_abs_amount ON transactions(ABS(amount));
@@ -0,0 +1,32 @@
+"""
+Shared fixtures: a migrated SQLite database with one user and a bank and
+card account.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """Fresh SQLite database with all migrations applied."""
+    monkeypatch.setattr(db, "IS_POSTGRES", False)
+    monkeypatch.setattr(db, "DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    db.apply_migrations()
+    connection = db.get_conn()
+    connection.execute("INSERT INTO users (id, username) VALUES (1, 'alice'), (2, 'bob')")
+    connection.execute(
+        "INSERT INTO accounts (id, user_id, name, type) VALUES "
+        "(1, 1, 'Bank', 'bank'), (2, 1, 'Card', 'card'), (3, 1, 'Other Card', 'card'), "
+        "(4, 2, 'Bob Bank', 'bank'), (5, 2, 'Bob Card', 'card')"
+    )
+    connection.execute(
+        "INSERT INTO statements (id, user_id, account_id, source, file_name) VALUES (1, 1, 1, 'test', 'test')"
+    )
+    connection.commit()
+    yield connection
+    connection.close()
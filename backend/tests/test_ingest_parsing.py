@@ -0,0 +1,89 @@
+"""
+Unit Tests for Statement Ingestion
+Tests for CSV header mapping, OFX scanning and value normalization helpers.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingest.csv import _auto_map_columns
+from app.ingest.normalize import normalize_description, parse_date
+from app.ingest.ofx import _parse_with_ofxparse, _scan_transactions
+
+
+class TestCsvColumnMapping:
+    """Test automatic CSV header mapping."""
+
+    def test_split_debit_credit_columns(self):
+        """Test that split withdrawal/deposit headers map to debit/credit."""
+        mapping = _auto_map_columns(["Date", "Narration", "Withdrawal Amt.", "Deposit Amt.", "Closing Balance"])
+        assert mapping["date"] == "Date"
+        assert mapping["description"] == "Narration"
+        assert mapping["debit"] == "Withdrawal Amt."
+        assert mapping["credit"] == "Deposit Amt."
+
+    def test_single_amount_column_not_taken_from_date(self):
+        """Test that a leading 'Value Date' column is not mistaken for the amount."""
+        mapping = _auto_map_columns(["Value Date", "Particulars", "Amount"])
+        assert mapping["date"] == "Value Date"
+        assert mapping["amount"] == "Amount"
+
+
+class TestNormalization:
+    """Test description normalization used for dedup hashes."""
+
+    def test_normalize_description_ascii(self):
+        """Test punctuation runs collapse to single spaces and text is upper-cased."""
+        assert normalize_description("  upi/123//shop-name  ") == "UPI 123 SHOP NAME"
+        assert normalize_description(None) == ""  # type: ignore
+
+    def test_normalize_description_non_ascii(self):
+        """Test that non-ASCII characters are treated as separators."""
+        assert normalize_description("CAFÉ ₹ résumé") == "CAF R SUM"
+
+    def test_parse_date_day_first(self):
+        """Test DD/MM/YYYY dates, month/day swaps and invalid dates."""
+        assert parse_date("05/03/2024") == "2024-03-05"
+        assert parse_date("15-03-2024") == "2024-03-15"
+        assert parse_date("03/15/2024") == "2024-03-15"
+        assert parse_date("31/02/2024") is None
+        assert parse_date("  ") is None
+
+
+SAMPLE_OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+SECURITY:NONE
+ENCODING:USASCII
+CHARSET:1252
+COMPRESSION:NONE
+OLDFILEUID:NONE
+NEWFILEUID:NONE
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><TRNUID>1
+<STMTRS><CURDEF>USD<BANKACCTFROM><BANKID>1<ACCTID>2<ACCTTYPE>CHECKING</BANKACCTFROM>
+<BANKTRANLIST><DTSTART>20240101<DTEND>20240131
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105220000[-5:EST]<TRNAMT>-45.67<FITID>1<NAME>GROCERY &amp; MORE<MEMO>weekly</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240110<TRNAMT>1.000,50<FITID>2<MEMO>only memo</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+class TestOfxScanner:
+    """Test the fast OFX transaction scanner."""
+
+    def test_scanner_matches_ofxparse(self):
+        """Test that the scanner yields the same currency and rows as ofxparse."""
+        scanned = _scan_transactions(SAMPLE_OFX)
+        assert scanned == _parse_with_ofxparse(SAMPLE_OFX)
+        currency, transactions = scanned
+        assert currency == "usd"
+        # 22:00 EST is already the next day in UTC, as ofxparse reports it
+        assert transactions[0] == ("2024-01-06", "GROCERY & MORE", -45.67)
+        assert transactions[1] == ("2024-01-10", "only memo", 1000.5)
+
+    def test_scanner_defers_multi_statement_files(self):
+        """Test that files with several statements go to ofxparse."""
+        payload = SAMPLE_OFX.replace(b"</OFX>", b"<CCSTMTRS></CCSTMTRS></OFX>")
+        assert _scan_transactions(payload) is None
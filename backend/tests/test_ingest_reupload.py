@@ -0,0 +1,91 @@
+"""
+Unit Tests for Re-uploaded Statements
+A statement uploaded a second time must insert nothing: the fallback parsers
+only run when the primary parse found no rows, not when its rows were all
+already imported.
+"""
+from app.ingest import pdf
+from app.ingest.csv import ingest_csv
+
+
+STRUCTURED_CSV = (
+    b"Date,Narration,Debit Amount,Credit Amount,Closing Balance\n"
+    b"01/02/2024,SWIGGY ORDER,250.00,,1000\n"
+    b"02/02/2024,SALARY CREDIT,,50000.00,51000\n"
+)
+
+# The mapped Date column holds descriptions, so only the raw fallback reads it
+UNSTRUCTURED_CSV = (
+    b"Date,Description,Amount\n"
+    b"GROCERY STORE,01/06/2024,1234.00\n"
+    b"REFUND ITEM,02/06/2024,100.00 Cr\n"
+)
+
+HDFC_TEXT = (
+    b"HDFC BANK Credit Card Statement\n"
+    b"12/03/2025 20:58:42 CALIFORNIA BURRITO BANGALORE 4 293.00\n"
+    b"20/03/2025 SWIGGY BANGALORE 1,234.00\n"
+)
+
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+
+class TestCsvReupload:
+    """Test uploading the same CSV twice."""
+
+    def test_structured_csv(self, conn):
+        """Test that the second upload only finds duplicates."""
+        inserted, skipped, duplicates = ingest_csv(conn, 1, 1, STRUCTURED_CSV, None, user_id=1)
+        assert inserted == 2
+        inserted, skipped, duplicates = ingest_csv(conn, 1, 1, STRUCTURED_CSV, None, user_id=1)
+        assert (inserted, duplicates) == (0, 2)
+        assert _count(conn) == 2
+
+    def test_unstructured_csv(self, conn):
+        """Test that a CSV read by the unstructured fallback is not imported twice."""
+        first, _, _ = ingest_csv(conn, 1, 1, UNSTRUCTURED_CSV, None, user_id=1)
+        assert first == 2
+        inserted, _, _ = ingest_csv(conn, 1, 1, UNSTRUCTURED_CSV, None, user_id=1)
+        assert inserted == 0
+        assert _count(conn) == first
+
+
+class TestTextReupload:
+    """Test uploading the same card statement text twice."""
+
+    def test_fallbacks_skipped(self, conn, monkeypatch):
+        """Test that rows the regex found again do not send the page to the fallbacks."""
+        ai_calls = []
+        monkeypatch.setattr(pdf, "parse_with_gemini", lambda text: ai_calls.append(text) or [])
+        monkeypatch.setattr(pdf, "_parse_enhanced_fallback", lambda text, card_type: ai_calls.append(text) or [])
+
+        inserted, _ = pdf.ingest_text(conn, 2, 1, HDFC_TEXT, user_id=1)
+        assert inserted == 2
+        inserted, skipped = pdf.ingest_text(conn, 2, 1, HDFC_TEXT, user_id=1)
+        assert (inserted, skipped) == (0, 2)
+        assert ai_calls == []
+        assert _count(conn) == 2
+
+
+class TestPdfReupload:
+    """Test the hybrid PDF ingest on a re-uploaded statement."""
+
+    def test_legacy_parser_skipped(self, conn, monkeypatch):
+        """Test that the legacy parser does not run when the new parser's rows were all imported."""
+        legacy_calls = []
+        monkeypatch.setattr(pdf, "STATEMENT_PARSER_AVAILABLE", True)
+        monkeypatch.setattr(pdf, "_ingest_with_new_parser", lambda *args: (0, 3, 3, True))
+        monkeypatch.setattr(pdf, "_ingest_with_old_parser", lambda *args: legacy_calls.append(args) or (1, 0, 1))
+
+        assert pdf.ingest_pdf(conn, 2, 1, b"%PDF-", user_id=1) == (0, 3)
+        assert legacy_calls == []
+
+    def test_legacy_parser_runs_when_nothing_found(self, conn, monkeypatch):
+        """Test that the legacy parser still runs when the new parser found nothing."""
+        monkeypatch.setattr(pdf, "STATEMENT_PARSER_AVAILABLE", True)
+        monkeypatch.setattr(pdf, "_ingest_with_new_parser", lambda *args: (0, 0, 0, False))
+        monkeypatch.setattr(pdf, "_ingest_with_old_parser", lambda *args: (1, 0, 1))
+
+        assert pdf.ingest_pdf(conn, 2, 1, b"%PDF-", user_id=1) == (1, 0)
@@ -0,0 +1,62 @@
+"""
+Unit Tests for the Shared Transaction Insert Path
+"""
+import sqlite3
+
+import pytest
+
+from app.ingest.store import _is_duplicate_error, insert_transactions
+
+
+def _row(n, description="SHOP"):
+    return (1, 1, f"2024-01-{n:02d}", -10.0 * n, "INR", description, description, f"hash-{n}", 1)
+
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+
+class TestInsertTransactions:
+    """Test batch insert counts."""
+
+    def test_counts_duplicates(self, conn):
+        """Test that rows already stored are reported as duplicates."""
+        rows = [_row(n) for n in range(1, 4)]
+        assert insert_transactions(conn, rows) == (3, 0, 0)
+        assert insert_transactions(conn, rows + [_row(4)]) == (1, 3, 0)
+        assert _count(conn) == 4
+
+    def test_batch_with_one_bad_row(self, conn):
+        """Test that one failing row costs only itself and the counts match the table."""
+        rows = [_row(n) for n in range(1, 6)]
+        rows[3] = _row(4, description=None)  # NOT NULL violation
+        assert insert_transactions(conn, rows) == (4, 0, 1)
+        assert _count(conn) == 4
+
+    def test_caller_owns_the_commit(self, conn):
+        """Test that inserted rows are not committed until the caller commits."""
+        insert_transactions(conn, [_row(1)])
+        conn.rollback()
+        assert _count(conn) == 0
+
+
+class TestIsDuplicateError:
+    """Test duplicate classification by driver error code."""
+
+    def _error(self, conn, row):
+        with pytest.raises(sqlite3.IntegrityError) as exc_info:
+            conn.execute(
+                "INSERT INTO transactions (account_id, statement_id, posted_at, amount, currency, "
+                "description_raw, description_norm, hash, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+        return exc_info.value
+
+    def test_unique_violation(self, conn):
+        """Test that a repeated hash is a duplicate."""
+        insert_transactions(conn, [_row(1)])
+        assert _is_duplicate_error(self._error(conn, _row(1)))
+
+    def test_not_null_violation(self, conn):
+        """Test that other constraint failures are not duplicates."""
+        assert not _is_duplicate_error(self._error(conn, _row(1, description=None)))
@@ -0,0 +1,55 @@
+"""
+Unit Tests for XLS Ingestion
+Tests that the header-row-0 shortcut reads workbooks as read_excel does.
+"""
+import datetime
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from app.ingest.xls import _read_with_first_row_header
+
+
+def _workbook(rows) -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+STATEMENT_ROWS = [
+    ["Date", "Narration", "Ref No", "Withdrawal", "Deposit", "Balance"],
+    [datetime.datetime(2024, 1, 5), "UPI-SHOP", "000123", 250.0, None, "1,000.50"],
+    [None, None, None, None, None, None],
+    [datetime.datetime(2024, 1, 6, 10, 30), "SALARY", "1e5", None, 50000, 51000.5],
+    ["07/01/2024", "ATM WDL", "0042", "500", None, None],
+    [None, None, None, None, None, None],
+]
+
+
+class TestFirstRowHeader:
+    """Test the TextParser shortcut against read_excel(header=0)."""
+
+    @pytest.mark.parametrize("rows", [
+        STATEMENT_ROWS,
+        # Numeric-looking text only: every column is converted, as read_excel does
+        [["Date", "Amount", "Code"], ["2024-01-05", "12.50", "007"], ["2024-01-06", "-3", "008"]],
+        # One column under a whitespace header: the header and blank rows read as
+        # empty lines to the parser, and must stay rows
+        [[" "], [None], [datetime.datetime(2024, 1, 5)], [None], [datetime.datetime(2024, 1, 6)]],
+        # A header reading "NA" is NaN in the headerless read, so this takes the
+        # read_excel path and keeps the header text
+        [["Date", "NA"], [datetime.datetime(2024, 1, 5), 1.5], [None, 2.5]],
+        [["Date", "Amount"]],
+    ])
+    def test_matches_read_excel(self, rows):
+        """Test that dates, blank rows and numeric-looking text come out the same."""
+        payload = _workbook(rows)
+        df_raw = pd.read_excel(io.BytesIO(payload), header=None)
+        expected = pd.read_excel(io.BytesIO(payload), header=0)
+        pd.testing.assert_frame_equal(_read_with_first_row_header(df_raw, payload), expected)
@@ -0,0 +1,89 @@
+"""
+Unit Tests for Card Payment Linking
+Tests for the SQL matching in link_card_payments on SQLite.
+"""
+import itertools
+
+from app.linking import link_card_payments
+
+_ids = itertools.count(1)
+
+
+def _tx(conn, account_id, posted_at, amount, description="SHOP", user_id=1):
+    """Insert a transaction and return its id."""
+    return conn.execute(
+        "INSERT INTO transactions (user_id, account_id, statement_id, posted_at, amount, currency, "
+        "description_raw, description_norm, hash) VALUES (?, ?, 1, ?, ?, 'INR', ?, ?, ?)",
+        (user_id, account_id, posted_at, amount, description, description, f"h{next(_ids)}"),
+    ).lastrowid
+
+
+def _links(conn):
+    return sorted(
+        (row[0], row[1])
+        for row in conn.execute(
+            "SELECT source_transaction_id, target_transaction_id FROM transaction_links "
+            "WHERE link_type = 'card_payment'"
+        )
+    )
+
+
+class TestLinkCardPayments:
+    """Test matching bank card payments to card transactions."""
+
+    def test_date_window_is_five_days(self, conn):
+        """Test that card rows exactly 5 days away link and 6 days away do not."""
+        payment = _tx(conn, 1, "2024-01-10", -5000.0, "CC CARD PAYMENT")
+        minus_5 = _tx(conn, 2, "2024-01-05", 5000.0)
+        plus_5 = _tx(conn, 2, "2024-01-15", 5000.0)
+        _tx(conn, 2, "2024-01-04", 5000.0)
+        _tx(conn, 2, "2024-01-16", 5000.0)
+        link_card_payments(conn, account_id=2, user_id=1)
+        assert _links(conn) == sorted([(payment, minus_5), (payment, plus_5)])
+
+    def test_amounts_must_match_to_the_cent(self, conn):
+        """Test that amounts one cent apart do not link, even when the float difference is < 0.01."""
+        payment = _tx(conn, 1, "2024-03-10", -1.13, "CARD PAYMENT RECEIVED")
+        _tx(conn, 2, "2024-03-10", 1.12)
+        _tx(conn, 2, "2024-03-10", 1.14)
+        same = _tx(conn, 2, "2024-03-11", -1.13)
+        link_card_payments(conn, account_id=2, user_id=1)
+        assert _links(conn) == [(payment, same)]
+
+    def test_only_card_payment_descriptions_link(self, conn):
+        """Test that other bank debits of the same amount are not linked."""
+        _tx(conn, 1, "2024-01-10", -5000.0, "RENT TRANSFER")
+        _tx(conn, 2, "2024-01-10", 5000.0)
+        link_card_payments(conn, account_id=2, user_id=1)
+        assert _links(conn) == []
+
+    def test_existing_links_are_not_duplicated(self, conn):
+        """Test that running the linker again adds no new links."""
+        payment = _tx(conn, 1, "2024-01-10", -5000.0, "CC CARD PAYMENT")
+        card = _tx(conn, 2, "2024-01-12", 5000.0)
+        link_card_payments(conn, account_id=2, user_id=1)
+        link_card_payments(conn, account_id=2, user_id=1)
+        link_card_payments(conn)
+        assert _links(conn) == [(payment, card)]
+
+    def test_scoped_by_user_and_account(self, conn):
+        """Test that only the given user's payments and the given card account are linked."""
+        payment = _tx(conn, 1, "2024-01-10", -5000.0, "CC CARD PAYMENT")
+        card = _tx(conn, 2, "2024-01-10", 5000.0)
+        other_card = _tx(conn, 3, "2024-01-10", 5000.0)
+        bob_payment = _tx(conn, 4, "2024-01-10", -5000.0, "CC CARD PAYMENT", user_id=2)
+        bob_card = _tx(conn, 5, "2024-01-10", 5000.0, user_id=2)
+
+        link_card_payments(conn, account_id=2, user_id=1)
+        assert _links(conn) == [(payment, card)]
+
+        link_card_payments(conn, user_id=1)
+        assert _links(conn) == sorted([(payment, card), (payment, other_card)])
+
+        link_card_payments(conn, account_id=5, user_id=2)
+        assert _links(conn) == sorted([(payment, card), (payment, other_card), (bob_payment, bob_card)])
+
+    def test_indexes_exist(self, conn):
+        """Test that the migration created the indexes the match relies on."""
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_transactions_account_posted", "idx_transactions_abs_amount"} <= names